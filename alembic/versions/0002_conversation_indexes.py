@@ -0,0 +1,50 @@
+"""composite conversation indexes on direct_messages
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Built concurrently so a large direct_messages stays writable
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_direct_messages_sender_recipient_created",
+            "direct_messages",
+            ["sender_id", "recipient_id", "created_at", "id"],
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_direct_messages_recipient_sender_created",
+            "direct_messages",
+            ["recipient_id", "sender_id", "created_at", "id"],
+            postgresql_concurrently=True,
+        )
+        # Both are prefixes of the composite indexes above
+        op.drop_index(
+            "ix_direct_messages_sender_id",
+            table_name="direct_messages",
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_direct_messages_recipient_id",
+            table_name="direct_messages",
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    op.create_index("ix_direct_messages_sender_id", "direct_messages", ["sender_id"])
+    op.create_index("ix_direct_messages_recipient_id", "direct_messages", ["recipient_id"])
+    op.drop_index("ix_direct_messages_recipient_sender_created", table_name="direct_messages")
+    op.drop_index("ix_direct_messages_sender_recipient_created", table_name="direct_messages")
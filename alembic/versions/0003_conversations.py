@@ -0,0 +1,70 @@
+"""materialized conversations table
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+from alembic import op
+
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "conversations",
+        sa.Column("user_a_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("user_b_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("last_message_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("last_sender_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("last_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("unread_a", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("unread_b", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("last_read_a_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("last_read_b_at", sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(["user_a_id"], ["users.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["user_b_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("user_a_id", "user_b_id"),
+        sa.CheckConstraint("user_a_id <= user_b_id", name="ck_conversations_ordered_pair"),
+    )
+
+    # Backfill from history. There was no read state before this table, so
+    # existing conversations start fully read.
+    op.execute(
+        """
+        INSERT INTO conversations (
+            user_a_id, user_b_id, last_message_id, last_sender_id, last_at,
+            unread_a, unread_b, last_read_a_at, last_read_b_at
+        )
+        SELECT DISTINCT ON (LEAST(sender_id, recipient_id), GREATEST(sender_id, recipient_id))
+            LEAST(sender_id, recipient_id),
+            GREATEST(sender_id, recipient_id),
+            id,
+            sender_id,
+            created_at,
+            0,
+            0,
+            created_at,
+            created_at
+        FROM direct_messages
+        ORDER BY
+            LEAST(sender_id, recipient_id),
+            GREATEST(sender_id, recipient_id),
+            created_at DESC,
+            id DESC
+        """
+    )
+
+    op.create_index("ix_conversations_user_a_last_at", "conversations", ["user_a_id", "last_at"])
+    op.create_index("ix_conversations_user_b_last_at", "conversations", ["user_b_id", "last_at"])
+
+
+def downgrade() -> None:
+    op.drop_table("conversations")
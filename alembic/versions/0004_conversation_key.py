@@ -0,0 +1,47 @@
+"""conversation_key on direct_messages
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+from alembic import op
+
+revision: str = "0004"
+down_revision: Union[str, None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Mirrors app.models.message.CONVERSATION_KEY_SQL at the time of this revision
+CONVERSATION_KEY_SQL = (
+    "md5(LEAST(sender_id, recipient_id)::text || ':' || "
+    "GREATEST(sender_id, recipient_id)::text)::uuid"
+)
+
+
+def upgrade() -> None:
+    # A stored generated column fills existing rows as part of the ALTER
+    op.add_column(
+        "direct_messages",
+        sa.Column(
+            "conversation_key",
+            postgresql.UUID(as_uuid=True),
+            sa.Computed(CONVERSATION_KEY_SQL, persisted=True),
+        ),
+    )
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_direct_messages_conversation_created",
+            "direct_messages",
+            ["conversation_key", "created_at", "id"],
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_direct_messages_conversation_created", table_name="direct_messages")
+    op.drop_column("direct_messages", "conversation_key")
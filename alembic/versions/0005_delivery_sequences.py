@@ -0,0 +1,52 @@
+"""per-user delivery sequences
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+from alembic import op
+
+revision: str = "0005"
+down_revision: Union[str, None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "delivery_sequences",
+        sa.Column("user_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("seq", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("user_id"),
+    )
+    # Existing messages keep NULL sequences: resume only covers messages
+    # written after this revision, older ones stay reachable through history
+    op.add_column("direct_messages", sa.Column("sender_seq", sa.BigInteger(), nullable=True))
+    op.add_column("direct_messages", sa.Column("recipient_seq", sa.BigInteger(), nullable=True))
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_direct_messages_recipient_seq",
+            "direct_messages",
+            ["recipient_id", "recipient_seq"],
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_direct_messages_sender_seq",
+            "direct_messages",
+            ["sender_id", "sender_seq"],
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_direct_messages_sender_seq", table_name="direct_messages")
+    op.drop_index("ix_direct_messages_recipient_seq", table_name="direct_messages")
+    op.drop_column("direct_messages", "recipient_seq")
+    op.drop_column("direct_messages", "sender_seq")
+    op.drop_table("delivery_sequences")
@@ -0,0 +1,46 @@
+"""full-text search over direct_messages
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+from alembic import op
+
+revision: str = "0006"
+down_revision: Union[str, None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Mirrors app.models.message.SEARCH_VECTOR_SQL at the time of this revision
+SEARCH_VECTOR_SQL = "to_tsvector('simple', content)"
+
+
+def upgrade() -> None:
+    # Like conversation_key, the stored column is filled by a table rewrite;
+    # on a large table run this in a maintenance window
+    op.add_column(
+        "direct_messages",
+        sa.Column(
+            "search_vector",
+            postgresql.TSVECTOR(),
+            sa.Computed(SEARCH_VECTOR_SQL, persisted=True),
+        ),
+    )
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_direct_messages_search_vector",
+            "direct_messages",
+            ["search_vector"],
+            postgresql_using="gin",
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_direct_messages_search_vector", table_name="direct_messages")
+    op.drop_column("direct_messages", "search_vector")
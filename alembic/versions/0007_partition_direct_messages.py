@@ -0,0 +1,178 @@
+"""monthly range partitions for direct_messages
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+from alembic import op
+
+revision: str = "0007"
+down_revision: Union[str, None] = "0006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Mirrors app.models.message at the time of this revision
+CONVERSATION_KEY_SQL = (
+    "md5(LEAST(sender_id, recipient_id)::text || ':' || "
+    "GREATEST(sender_id, recipient_id)::text)::uuid"
+)
+SEARCH_VECTOR_SQL = "to_tsvector('simple', content)"
+
+COPY_COLUMNS = "id, sender_id, recipient_id, content, sender_seq, recipient_seq, created_at"
+
+# Partitions are named direct_messages_pYYYY_MM and cover one UTC month.
+# The advisory lock keeps workers that start together from racing on CREATE.
+CREATE_PARTITION_FN = """
+CREATE FUNCTION direct_messages_create_partition(month timestamptz) RETURNS text
+LANGUAGE plpgsql AS $$
+DECLARE
+    start_at timestamptz := date_trunc('month', month AT TIME ZONE 'UTC') AT TIME ZONE 'UTC';
+    end_at timestamptz := (date_trunc('month', month AT TIME ZONE 'UTC') + interval '1 month') AT TIME ZONE 'UTC';
+    part_name text := 'direct_messages_p' || to_char(month AT TIME ZONE 'UTC', 'YYYY_MM');
+BEGIN
+    PERFORM pg_advisory_xact_lock(hashtext('direct_messages_partitions'));
+    IF to_regclass(part_name) IS NULL THEN
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF direct_messages FOR VALUES FROM (%L) TO (%L)',
+            part_name, start_at, end_at
+        );
+    END IF;
+    RETURN part_name;
+END
+$$
+"""
+
+ENSURE_PARTITIONS_FN = """
+CREATE FUNCTION direct_messages_ensure_partitions(months_ahead int) RETURNS void
+LANGUAGE plpgsql AS $$
+BEGIN
+    FOR i IN 0..months_ahead LOOP
+        PERFORM direct_messages_create_partition(now() + make_interval(months => i));
+    END LOOP;
+END
+$$
+"""
+
+
+def _create_indexes() -> None:
+    # Built on the parent, so every partition (present and future) gets its own
+    # small copy. The single-column created_at index is gone: partition bounds
+    # already narrow by time.
+    op.create_index(
+        "ix_direct_messages_sender_recipient_created",
+        "direct_messages",
+        ["sender_id", "recipient_id", "created_at", "id"],
+    )
+    op.create_index(
+        "ix_direct_messages_recipient_sender_created",
+        "direct_messages",
+        ["recipient_id", "sender_id", "created_at", "id"],
+    )
+    op.create_index(
+        "ix_direct_messages_conversation_created",
+        "direct_messages",
+        ["conversation_key", "created_at", "id"],
+    )
+    op.create_index("ix_direct_messages_recipient_seq", "direct_messages", ["recipient_id", "recipient_seq"])
+    op.create_index("ix_direct_messages_sender_seq", "direct_messages", ["sender_id", "sender_seq"])
+    op.create_index(
+        "ix_direct_messages_search_vector",
+        "direct_messages",
+        ["search_vector"],
+        postgresql_using="gin",
+    )
+
+
+def _message_columns() -> list[sa.Column]:
+    return [
+        sa.Column("id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("sender_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("recipient_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column(
+            "conversation_key",
+            postgresql.UUID(as_uuid=True),
+            sa.Computed(CONVERSATION_KEY_SQL, persisted=True),
+        ),
+        sa.Column("content", sa.Text(), nullable=False),
+        sa.Column(
+            "search_vector",
+            postgresql.TSVECTOR(),
+            sa.Computed(SEARCH_VECTOR_SQL, persisted=True),
+        ),
+        sa.Column("sender_seq", sa.BigInteger(), nullable=True),
+        sa.Column("recipient_seq", sa.BigInteger(), nullable=True),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.ForeignKeyConstraint(["sender_id"], ["users.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["recipient_id"], ["users.id"], ondelete="CASCADE"),
+    ]
+
+
+def upgrade() -> None:
+    # Postgres can't partition a table in place: build the partitioned table
+    # next to the old one, copy, then swap. This holds an exclusive lock for
+    # the whole copy, so run it in a maintenance window.
+    op.rename_table("direct_messages", "direct_messages_unpartitioned")
+    op.execute(
+        "ALTER TABLE direct_messages_unpartitioned "
+        "RENAME CONSTRAINT direct_messages_pkey TO direct_messages_unpartitioned_pkey"
+    )
+
+    op.create_table(
+        "direct_messages",
+        *_message_columns(),
+        # The partition key has to be part of every unique constraint
+        sa.PrimaryKeyConstraint("id", "created_at"),
+        postgresql_partition_by="RANGE (created_at)",
+    )
+    op.execute(CREATE_PARTITION_FN)
+    op.execute(ENSURE_PARTITIONS_FN)
+    # Catches rows outside every monthly range instead of failing the insert
+    op.execute("CREATE TABLE direct_messages_default PARTITION OF direct_messages DEFAULT")
+    op.execute(
+        """
+        SELECT direct_messages_create_partition(month)
+        FROM generate_series(
+            (SELECT min(created_at) FROM direct_messages_unpartitioned),
+            now(),
+            interval '1 month'
+        ) AS month
+        """
+    )
+    op.execute("SELECT direct_messages_ensure_partitions(2)")
+
+    op.execute(
+        f"INSERT INTO direct_messages ({COPY_COLUMNS}) "
+        f"SELECT {COPY_COLUMNS} FROM direct_messages_unpartitioned"
+    )
+    op.drop_table("direct_messages_unpartitioned")
+    _create_indexes()
+    op.execute("ANALYZE direct_messages")
+
+
+def downgrade() -> None:
+    op.rename_table("direct_messages", "direct_messages_partitioned")
+    op.execute(
+        "ALTER TABLE direct_messages_partitioned "
+        "RENAME CONSTRAINT direct_messages_pkey TO direct_messages_partitioned_pkey"
+    )
+    op.create_table("direct_messages", *_message_columns(), sa.PrimaryKeyConstraint("id"))
+    op.execute(
+        f"INSERT INTO direct_messages ({COPY_COLUMNS}) "
+        f"SELECT {COPY_COLUMNS} FROM direct_messages_partitioned"
+    )
+    # Dropping the parent drops every partition and their indexes
+    op.drop_table("direct_messages_partitioned")
+    op.execute("DROP FUNCTION direct_messages_ensure_partitions(int)")
+    op.execute("DROP FUNCTION direct_messages_create_partition(timestamptz)")
+    _create_indexes()
+    op.create_index("ix_direct_messages_created_at", "direct_messages", ["created_at"])
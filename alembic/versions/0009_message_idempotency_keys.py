@@ -0,0 +1,42 @@
+"""idempotency keys for sent messages
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+from alembic import op
+
+revision: str = "0009"
+down_revision: Union[str, None] = "0008"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "message_idempotency_keys",
+        sa.Column("sender_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("key", sa.String(100), nullable=False),
+        sa.Column("message_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.ForeignKeyConstraint(["sender_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("sender_id", "key"),
+    )
+    # Expired keys are deleted by age
+    op.create_index(
+        "ix_message_idempotency_keys_created_at", "message_idempotency_keys", ["created_at"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("message_idempotency_keys")
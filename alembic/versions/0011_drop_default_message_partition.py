@@ -0,0 +1,43 @@
+"""drop the default direct_messages partition
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = "0011"
+down_revision: Union[str, None] = "0010"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COPY_COLUMNS = "id, sender_id, recipient_id, content, sender_seq, recipient_seq, created_at"
+
+
+def upgrade() -> None:
+    # A default partition may hold any created_at, so the planner can never
+    # prune it or read the months in order (ORDER BY created_at LIMIT n turns
+    # into a MergeAppend over every partition). Move its rows into monthly
+    # partitions; the maintainer creates months ahead, so inserts always fit.
+    op.execute("ALTER TABLE direct_messages DETACH PARTITION direct_messages_default")
+    op.execute(
+        """
+        SELECT direct_messages_create_partition(month)
+        FROM (
+            SELECT DISTINCT date_trunc('month', created_at AT TIME ZONE 'UTC') AT TIME ZONE 'UTC' AS month
+            FROM direct_messages_default
+        ) AS months
+        """
+    )
+    op.execute(
+        f"INSERT INTO direct_messages ({COPY_COLUMNS}) "
+        f"SELECT {COPY_COLUMNS} FROM direct_messages_default"
+    )
+    op.drop_table("direct_messages_default")
+
+
+def downgrade() -> None:
+    op.execute("CREATE TABLE direct_messages_default PARTITION OF direct_messages DEFAULT")
@@ -1,12 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import uuid
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.security import create_access_token, hash_password, verify_password
+from app.core.config import settings
+from app.core.deps import client_address, enforce_rate_limit
+from app.core.security import REFRESH_TOKEN, create_access_token, create_refresh_token, decode_token_claims
 from app.db.session import get_db
 from app.models.user import User
-from app.schemas.auth import LoginRequest, RegisterRequest, TokenResponse
+from app.schemas.auth import LoginRequest, RefreshRequest, RegisterRequest, TokenResponse
 from app.schemas.user import UserOut
+from app.services.password_hasher import password_hasher
+from app.services.user_cache import known_users, user_cache
 
 router = APIRouter()
 
@@ -22,20 +28,51 @@ async def register(body: RegisterRequest, db: AsyncSession = Depends(get_db)):
     user = User(
         username=body.username,
         email=body.email,
-        hashed_password=hash_password(body.password),
+        hashed_password=await password_hasher.hash(body.password),
     )
     db.add(user)
     await db.commit()
     await db.refresh(user)
+    known_users.add(user.id)
     return user
 
 
 @router.post("/login", response_model=TokenResponse)
-async def login(body: LoginRequest, db: AsyncSession = Depends(get_db)):
+async def login(body: LoginRequest, request: Request, db: AsyncSession = Depends(get_db)):
+    # Checked before the lookup and bcrypt, which are what a flood would cost.
+    # The per-username bucket is per address too: keyed on the username
+    # alone, anyone could keep an account locked out, its owner included
+    rate = settings.LOGIN_RATE_PER_MINUTE / 60
+    address = client_address(request)
+    if address is not None:
+        await enforce_rate_limit("login_addr", address, rate, settings.LOGIN_RATE_BURST)
+    await enforce_rate_limit("login", f"{body.username}|{address}", rate, settings.LOGIN_RATE_BURST)
+
     result = await db.execute(select(User).where(User.username == body.username))
     user = result.scalar_one_or_none()
-    if not user or not verify_password(body.password, user.hashed_password):
+    if not user or not await password_hasher.verify(body.password, user.hashed_password):
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
-    token = create_access_token(str(user.id))
-    return TokenResponse(access_token=token)
+    return _tokens(user.id)
+
+
+@router.post("/refresh", response_model=TokenResponse)
+async def refresh(body: RefreshRequest, db: AsyncSession = Depends(get_db)):
+    """Exchange a refresh token for a new token pair, skipping password verification."""
+    payload = decode_token_claims(body.refresh_token, REFRESH_TOKEN)
+    try:
+        user_id = uuid.UUID(payload["sub"]) if payload else None
+    except ValueError:
+        user_id = None
+    user = await user_cache.get_user(user_id, db) if user_id else None
+    if not user or not user.is_active:
+        raise HTTPException(status_code=401, detail="Invalid refresh token")
+    return _tokens(user.id)
+
+
+def _tokens(user_id: uuid.UUID) -> TokenResponse:
+    return TokenResponse(
+        access_token=create_access_token(str(user_id)),
+        refresh_token=create_refresh_token(str(user_id)),
+        expires_in=settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+    )
@@ -1,115 +1,416 @@
 import uuid
+from datetime import datetime
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import and_, desc, or_, select
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import and_, desc, func, or_, select, tuple_, union_all
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.deps import get_current_user
-from app.db.session import get_db
-from app.models.message import DirectMessage
+from app.core.config import settings
+from app.core.deps import enforce_rate_limit, get_current_user
+from app.core.pagination import decode_cursor, encode_cursor, set_next_cursor
+from app.core.wire import dumps
+from app.db.session import AsyncSessionLocal, get_db
+from app.models.conversation import Conversation
+from app.models.message import SEARCH_CONFIG, DirectMessage, conversation_key
+from app.models.room import Room, RoomMember
 from app.models.user import User
-from app.schemas.message import DMCreate, DMOut
+from app.schemas.message import (
+    ConversationOut,
+    DMBatchCreate,
+    DMBatchResult,
+    DMCreate,
+    DMOut,
+    DMReadCursor,
+    MessageSearchHit,
+    UnreadOut,
+)
 from app.services.connection_manager import manager
+from app.services.delivery import message_payload
+from app.services.message_writer import message_writer, write_batch
+from app.services.read_receipts import read_receipts
+from app.services.user_cache import AuthUser, known_users
 
 router = APIRouter()
 
 
+# Partition pruning ignores row comparisons, so each keyset predicate also
+# carries a plain bound on created_at; without it every page scans every month
+
+
+def messages_before(cursor: str):
+    """Messages older than the ``(created_at, id)`` position in ``cursor``."""
+    created_at, message_id = decode_cursor(cursor, datetime, uuid.UUID)
+    return and_(
+        DirectMessage.created_at <= created_at,
+        tuple_(DirectMessage.created_at, DirectMessage.id) < tuple_(created_at, message_id),
+    )
+
+
+def messages_after(cursor: str):
+    """Messages newer than the ``(created_at, id)`` position in ``cursor``."""
+    return _after_position(*decode_cursor(cursor, datetime, uuid.UUID))
+
+
+def _after_position(created_at: datetime, message_id: uuid.UUID):
+    return and_(
+        DirectMessage.created_at >= created_at,
+        tuple_(DirectMessage.created_at, DirectMessage.id) > tuple_(created_at, message_id),
+    )
+
+
 @router.post("/dm", response_model=DMOut, status_code=201)
 async def send_dm(
     body: DMCreate,
-    current_user: User = Depends(get_current_user),
+    idempotency_key: str | None = Header(None, min_length=1, max_length=100),
+    current_user: AuthUser = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
-    recipient = await db.get(User, body.recipient_id)
-    if not recipient:
+    """Send one message. With an ``Idempotency-Key`` header, a retry returns the original."""
+    await enforce_rate_limit(
+        "message", str(current_user.id), settings.MESSAGE_RATE_PER_SECOND, settings.MESSAGE_RATE_BURST
+    )
+    if not await known_users.exists(body.recipient_id, db):
         raise HTTPException(status_code=404, detail="Recipient not found")
 
-    msg = DirectMessage(
-        sender_id=current_user.id,
-        recipient_id=body.recipient_id,
-        content=body.content,
-    )
-    db.add(msg)
-    await db.commit()
-    await db.refresh(msg)
-
-    payload = {
-        "id": str(msg.id),
-        "sender_id": str(msg.sender_id),
-        "sender_username": current_user.username,
-        "recipient_id": str(msg.recipient_id),
-        "content": msg.content,
-        "created_at": msg.created_at.isoformat(),
-    }
-    await manager.send_to_user(body.recipient_id, payload)
+    if idempotency_key is not None:
+        [(msg, replayed)] = await write_batch(
+            db, current_user.id, [(body.recipient_id, body.content, idempotency_key)]
+        )
+        if replayed:
+            return msg
+    else:
+        msg = await message_writer.write(current_user.id, body.recipient_id, body.content)
+
+    payload = message_payload(msg, current_user.username)
+    await manager.send_to_users([body.recipient_id, current_user.id], payload)
 
     return msg
 
 
+@router.post("/dm/batch", response_model=list[DMBatchResult], status_code=201)
+async def send_dm_batch(
+    body: DMBatchCreate,
+    current_user: AuthUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Send many messages in one transaction, for integrations and bots.
+
+    Results come back in request order; items whose ``idempotency_key`` was
+    already used return the stored message with ``duplicate`` set and are
+    not delivered again.
+    """
+    items = body.messages
+    if len(items) > settings.SEND_BATCH_MAX_MESSAGES:
+        raise HTTPException(
+            status_code=400, detail=f"At most {settings.SEND_BATCH_MAX_MESSAGES} messages per batch"
+        )
+    keys = [item.idempotency_key for item in items if item.idempotency_key is not None]
+    if len(keys) != len(set(keys)):
+        raise HTTPException(status_code=400, detail="Duplicate idempotency_key in batch")
+    await enforce_rate_limit(
+        "send_batch", str(current_user.id), settings.SEND_BATCH_RATE_PER_SECOND, settings.SEND_BATCH_RATE_BURST
+    )
+
+    if missing := await known_users.missing({item.recipient_id for item in items}, db):
+        raise HTTPException(
+            status_code=404, detail=f"Recipient not found: {', '.join(sorted(map(str, missing)))}"
+        )
+
+    results = await write_batch(
+        db, current_user.id, [(item.recipient_id, item.content, item.idempotency_key) for item in items]
+    )
+    for msg, replayed in results:
+        if not replayed:
+            payload = message_payload(msg, current_user.username)
+            await manager.send_to_users([msg.recipient_id, current_user.id], payload)
+    return [
+        DMBatchResult.model_validate(msg).model_copy(update={"duplicate": replayed})
+        for msg, replayed in results
+    ]
+
+
 @router.get("/dm/{other_user_id}", response_model=list[DMOut])
 async def get_dm_history(
     other_user_id: uuid.UUID,
-    limit: int = 50,
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
     offset: int = 0,
-    current_user: User = Depends(get_current_user),
+    before: str | None = None,
+    after: str | None = None,
+    current_user: AuthUser = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
-    stmt = (
-        select(DirectMessage)
-        .where(
-            or_(
-                and_(
-                    DirectMessage.sender_id == current_user.id,
-                    DirectMessage.recipient_id == other_user_id,
-                ),
-                and_(
-                    DirectMessage.sender_id == other_user_id,
-                    DirectMessage.recipient_id == current_user.id,
-                ),
-            )
+    """Return messages exchanged with ``other_user_id``, newest first.
+
+    ``before`` pages back through older messages and ``after`` fetches newer
+    ones; ``X-Next-Cursor`` continues in the same direction. ``offset`` is
+    only kept for older clients.
+    """
+    if before and after:
+        raise HTTPException(status_code=400, detail="Pass either before or after, not both")
+
+    key = conversation_key(current_user.id, other_user_id)
+    stmt = select(DirectMessage).where(DirectMessage.conversation_key == key)
+
+    if after:
+        stmt = (
+            stmt.where(messages_after(after))
+            .order_by(DirectMessage.created_at, DirectMessage.id)
+            .limit(limit)
         )
-        .order_by(desc(DirectMessage.created_at))
+        messages = (await db.execute(stmt)).scalars().all()
+        if len(messages) == limit:
+            set_next_cursor(response, messages[-1].created_at, messages[-1].id)
+        return messages[::-1]
+
+    if before:
+        stmt = stmt.where(messages_before(before))
+    stmt = (
+        stmt.order_by(desc(DirectMessage.created_at), desc(DirectMessage.id))
         .offset(offset)
         .limit(limit)
     )
-    result = await db.execute(stmt)
-    return result.scalars().all()
+    messages = (await db.execute(stmt)).scalars().all()
+    if len(messages) == limit:
+        set_next_cursor(response, messages[-1].created_at, messages[-1].id)
+    return messages
+
+
+@router.get("/export")
+async def export_history(
+    with_user: uuid.UUID | None = None,
+    after: str | None = None,
+    current_user: AuthUser = Depends(get_current_user),
+):
+    """Stream every message the user sent or received as NDJSON, oldest first.
+
+    Rows are read in keyset pages of ``EXPORT_BATCH_SIZE``, each in its own
+    short transaction, so memory stays flat however long the history is and
+    a slow reader never holds a pooled connection. Each line carries the
+    ``cursor`` to pass as ``after`` to resume an interrupted export;
+    ``with_user`` limits the export to one conversation.
+    """
+    uid = current_user.id
+    stmt = select(
+        DirectMessage.id,
+        DirectMessage.sender_id,
+        DirectMessage.recipient_id,
+        DirectMessage.content,
+        DirectMessage.created_at,
+        DirectMessage.sender_seq,
+        DirectMessage.recipient_seq,
+    )
+    if with_user is not None:
+        stmt = stmt.where(DirectMessage.conversation_key == conversation_key(uid, with_user))
+    else:
+        stmt = stmt.where(or_(DirectMessage.sender_id == uid, DirectMessage.recipient_id == uid))
+    # Decoded here so a bad cursor is a 400, not a broken stream
+    position = decode_cursor(after, datetime, uuid.UUID) if after else None
+    stmt = stmt.order_by(DirectMessage.created_at, DirectMessage.id).limit(settings.EXPORT_BATCH_SIZE)
+
+    async def lines():
+        nonlocal position
+        while True:
+            page = stmt if position is None else stmt.where(_after_position(*position))
+            # A connection per page, returned before the client reads it
+            async with AsyncSessionLocal() as db:
+                rows = (await db.execute(page)).all()
+            if rows:
+                yield "".join(
+                    dumps(
+                        {
+                            "id": str(row.id),
+                            "sender_id": str(row.sender_id),
+                            "recipient_id": str(row.recipient_id),
+                            "content": row.content,
+                            "created_at": row.created_at.isoformat(),
+                            "sender_seq": row.sender_seq,
+                            "recipient_seq": row.recipient_seq,
+                            "cursor": encode_cursor(row.created_at, row.id),
+                        }
+                    )
+                    + "\n"
+                    for row in rows
+                )
+            if len(rows) < settings.EXPORT_BATCH_SIZE:
+                return
+            position = (rows[-1].created_at, rows[-1].id)
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@router.get("/search", response_model=list[MessageSearchHit])
+async def search_messages(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=200),
+    with_user: uuid.UUID | None = None,
+    limit: int = Query(20, ge=1, le=100),
+    before: str | None = None,
+    current_user: AuthUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Full-text search over the user's messages, best matches first.
+
+    ``q`` accepts web search syntax (quoted phrases, ``or``, ``-word``).
+    Pages are keyed on (rank, created_at, id); pass ``X-Next-Cursor`` as
+    ``before`` for the next page.
+    """
+    uid = current_user.id
+    query = func.websearch_to_tsquery(SEARCH_CONFIG, q)
+    rank = func.ts_rank(DirectMessage.search_vector, query)
+
+    stmt = select(
+        DirectMessage.id,
+        DirectMessage.sender_id,
+        DirectMessage.recipient_id,
+        DirectMessage.content,
+        DirectMessage.created_at,
+        DirectMessage.sender_seq,
+        DirectMessage.recipient_seq,
+        rank.label("rank"),
+    ).where(DirectMessage.search_vector.bool_op("@@")(query))
+    if with_user is not None:
+        stmt = stmt.where(DirectMessage.conversation_key == conversation_key(uid, with_user))
+    else:
+        stmt = stmt.where(or_(DirectMessage.sender_id == uid, DirectMessage.recipient_id == uid))
+    if before:
+        # Rank leads the key, so created_at can't bound a page here; the
+        # text match and user filters do the narrowing instead
+        position = tuple_(rank, DirectMessage.created_at, DirectMessage.id)
+        stmt = stmt.where(position < tuple_(*decode_cursor(before, float, datetime, uuid.UUID)))
+    page = (
+        stmt.order_by(desc("rank"), desc(DirectMessage.created_at), desc(DirectMessage.id))
+        .limit(limit)
+        .subquery()
+    )
 
+    # Headlines are expensive, so only build them for the rows on this page
+    snippet = func.ts_headline(
+        SEARCH_CONFIG, page.c.content, query, "MaxFragments=2, MaxWords=20, MinWords=5"
+    )
+    rows = (
+        await db.execute(
+            select(page, snippet.label("snippet")).order_by(
+                desc(page.c.rank), desc(page.c.created_at), desc(page.c.id)
+            )
+        )
+    ).all()
+    if len(rows) == limit:
+        set_next_cursor(response, rows[-1].rank, rows[-1].created_at, rows[-1].id)
+    return [MessageSearchHit.model_validate(row, from_attributes=True) for row in rows]
 
-@router.get("/conversations", response_model=list[dict])
+
+@router.get("/conversations", response_model=list[ConversationOut])
 async def list_conversations(
-    current_user: User = Depends(get_current_user),
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    before: str | None = None,
+    current_user: AuthUser = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
-    """Return the most recent message per conversation partner."""
-    # Subquery: for each (sender, recipient) pair involving current user,
-    # get the latest message id
+    """Return the most recent message per conversation partner, newest first.
+
+    Pages are keyed on (last_at, user_id); pass the ``X-Next-Cursor`` header
+    of one page as ``before`` to fetch the next.
+    """
     uid = current_user.id
 
+    # The user sits on either side of the ordered pair; each side is its own
+    # (user, last_at) index scan bounded by the page size
+    side_a = select(
+        Conversation.user_b_id.label("partner_id"),
+        Conversation.last_message_id,
+        Conversation.last_at,
+        Conversation.unread_a.label("unread"),
+    ).where(Conversation.user_a_id == uid)
+    side_b = select(
+        Conversation.user_a_id.label("partner_id"),
+        Conversation.last_message_id,
+        Conversation.last_at,
+        Conversation.unread_b.label("unread"),
+    ).where(Conversation.user_b_id == uid, Conversation.user_a_id != uid)
+    if before:
+        last_at, partner_id = decode_cursor(before, datetime, uuid.UUID)
+        side_a = side_a.where(
+            tuple_(Conversation.last_at, Conversation.user_b_id) < tuple_(last_at, partner_id)
+        )
+        side_b = side_b.where(
+            tuple_(Conversation.last_at, Conversation.user_a_id) < tuple_(last_at, partner_id)
+        )
+    side_a = side_a.order_by(desc(Conversation.last_at), desc(Conversation.user_b_id)).limit(limit)
+    side_b = side_b.order_by(desc(Conversation.last_at), desc(Conversation.user_a_id)).limit(limit)
+    page = union_all(side_a, side_b).subquery()
+
     stmt = (
-        select(DirectMessage)
-        .where(
-            or_(DirectMessage.sender_id == uid, DirectMessage.recipient_id == uid)
+        select(
+            page.c.partner_id,
+            page.c.last_at,
+            page.c.unread,
+            User.username,
+            DirectMessage.content,
         )
-        .order_by(desc(DirectMessage.created_at))
+        .join(User, User.id == page.c.partner_id)
+        # last_at is the last message's created_at, which lets the planner
+        # probe only that message's partition. The message itself may have
+        # been archived.
+        .outerjoin(
+            DirectMessage,
+            (DirectMessage.id == page.c.last_message_id)
+            & (DirectMessage.created_at == page.c.last_at),
+        )
+        .order_by(desc(page.c.last_at), desc(page.c.partner_id))
+        .limit(limit)
+    )
+
+    rows = (await db.execute(stmt)).all()
+    if len(rows) == limit:
+        set_next_cursor(response, rows[-1].last_at, rows[-1].partner_id)
+    return [
+        ConversationOut(
+            user_id=row.partner_id,
+            username=row.username,
+            last_message=row.content,
+            last_at=row.last_at,
+            unread=row.unread,
+        )
+        for row in rows
+    ]
+
+
+@router.post("/read", status_code=204)
+async def mark_read(body: DMReadCursor, current_user: AuthUser = Depends(get_current_user)):
+    """Move the read cursor for the conversation with ``user_id``.
+
+    Cursors are buffered and written in batches; the unread count and the
+    partner's ``read`` receipt follow within ``READ_FLUSH_INTERVAL_SECONDS``.
+    """
+    read_receipts.mark_direct(current_user.id, body.user_id, body.last_read_at)
+
+
+@router.get("/unread", response_model=UnreadOut)
+async def unread_counts(
+    current_user: AuthUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Totals from the per-conversation counters and room read cursors; no message is counted."""
+    uid = current_user.id
+    direct_a = select(func.coalesce(func.sum(Conversation.unread_a), 0)).where(Conversation.user_a_id == uid)
+    direct_b = select(func.coalesce(func.sum(Conversation.unread_b), 0)).where(
+        Conversation.user_b_id == uid, Conversation.user_a_id != uid
     )
-    result = await db.execute(stmt)
-    messages = result.scalars().all()
-
-    seen: set[uuid.UUID] = set()
-    conversations = []
-    for msg in messages:
-        other_id = msg.recipient_id if msg.sender_id == uid else msg.sender_id
-        if other_id in seen:
-            continue
-        seen.add(other_id)
-        other = await db.get(User, other_id)
-        conversations.append(
-            {
-                "user_id": str(other_id),
-                "username": other.username if other else "unknown",
-                "last_message": msg.content,
-                "last_at": msg.created_at.isoformat(),
-            }
+    rooms = (
+        select(func.coalesce(func.sum(Room.last_seq - RoomMember.last_read_seq), 0))
+        .select_from(RoomMember)
+        .join(Room, Room.id == RoomMember.room_id)
+        .where(RoomMember.user_id == uid)
+    )
+    row = (
+        await db.execute(
+            select(
+                (direct_a.scalar_subquery() + direct_b.scalar_subquery()).label("direct"),
+                rooms.scalar_subquery().label("rooms"),
+            )
         )
-    return conversations
+    ).one()
+    return UnreadOut(direct=row.direct, rooms=row.rooms, total=row.direct + row.rooms)
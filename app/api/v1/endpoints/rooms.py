@@ -0,0 +1,186 @@
+import uuid
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import delete, desc, select, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.deps import enforce_rate_limit, get_current_user
+from app.core.pagination import NEXT_CURSOR_HEADER, decode_cursor, set_next_cursor
+from app.db.session import get_db
+from app.models.room import Room, RoomMember, RoomMessage
+from app.schemas.room import (
+    ReadCursor,
+    RoomCreate,
+    RoomMemberAdd,
+    RoomMessageCreate,
+    RoomMessageOut,
+    RoomOut,
+)
+from app.services.connection_manager import manager
+from app.services.read_receipts import read_receipts
+from app.services.rooms import post_room_message, room_members, room_message_payload
+from app.services.user_cache import AuthUser, known_users
+
+router = APIRouter()
+
+
+async def _members_of(room_id: uuid.UUID, user: AuthUser, db: AsyncSession) -> frozenset[uuid.UUID]:
+    # Non-members get the same 404 as a missing room
+    members = await room_members.get(room_id, db)
+    if user.id not in members:
+        raise HTTPException(status_code=404, detail="Room not found")
+    return members
+
+
+async def _check_users_exist(user_ids: set[uuid.UUID], db: AsyncSession):
+    if await known_users.missing(user_ids, db):
+        raise HTTPException(status_code=404, detail="User not found")
+
+
+@router.post("", response_model=RoomOut, status_code=201)
+async def create_room(
+    body: RoomCreate,
+    current_user: AuthUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    member_ids = set(body.member_ids) - {current_user.id}
+    if len(member_ids) + 1 > settings.ROOM_MAX_MEMBERS:
+        raise HTTPException(status_code=400, detail="Too many members")
+    if member_ids:
+        await _check_users_exist(member_ids, db)
+
+    room = Room(name=body.name, created_by=current_user.id, last_seq=0)
+    db.add(room)
+    await db.flush()
+    db.add(RoomMember(room_id=room.id, user_id=current_user.id, role="owner", last_read_seq=0))
+    db.add_all(RoomMember(room_id=room.id, user_id=uid, last_read_seq=0) for uid in member_ids)
+    await db.commit()
+    await db.refresh(room)
+    return RoomOut(id=room.id, name=room.name, last_seq=room.last_seq, last_at=room.last_at)
+
+
+@router.get("", response_model=list[RoomOut])
+async def list_rooms(
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    before: str | None = None,
+    current_user: AuthUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Rooms the user belongs to, most recently active first, with unread counts."""
+    stmt = (
+        select(Room, RoomMember.last_read_seq)
+        .join(RoomMember, RoomMember.room_id == Room.id)
+        .where(RoomMember.user_id == current_user.id)
+        .order_by(desc(Room.last_at), desc(Room.id))
+        .limit(limit)
+    )
+    if before:
+        stmt = stmt.where(tuple_(Room.last_at, Room.id) < tuple_(*decode_cursor(before, datetime, uuid.UUID)))
+    rows = (await db.execute(stmt)).all()
+    if len(rows) == limit:
+        set_next_cursor(response, rows[-1][0].last_at, rows[-1][0].id)
+    return [
+        RoomOut(
+            id=room.id,
+            name=room.name,
+            last_seq=room.last_seq,
+            last_at=room.last_at,
+            unread=max(room.last_seq - last_read_seq, 0),
+        )
+        for room, last_read_seq in rows
+    ]
+
+
+@router.post("/{room_id}/members", status_code=204)
+async def add_member(
+    room_id: uuid.UUID,
+    body: RoomMemberAdd,
+    current_user: AuthUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    members = await _members_of(room_id, current_user, db)
+    if body.user_id in members:
+        return
+    if len(members) >= settings.ROOM_MAX_MEMBERS:
+        raise HTTPException(status_code=400, detail="Too many members")
+    await _check_users_exist({body.user_id}, db)
+    # New members start with the history already read
+    last_seq = select(Room.last_seq).where(Room.id == room_id).scalar_subquery()
+    await db.execute(
+        insert(RoomMember)
+        .values(room_id=room_id, user_id=body.user_id, role="member", last_read_seq=last_seq)
+        .on_conflict_do_nothing()
+    )
+    await db.commit()
+    room_members.invalidate(room_id)
+
+
+@router.delete("/{room_id}/members/{user_id}", status_code=204)
+async def remove_member(
+    room_id: uuid.UUID,
+    user_id: uuid.UUID,
+    current_user: AuthUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Leave a room, or remove someone else from it if you own it."""
+    await _members_of(room_id, current_user, db)
+    if user_id != current_user.id:
+        role = await db.scalar(
+            select(RoomMember.role).where(RoomMember.room_id == room_id, RoomMember.user_id == current_user.id)
+        )
+        if role != "owner":
+            raise HTTPException(status_code=403, detail="Only the owner can remove members")
+    await db.execute(delete(RoomMember).where(RoomMember.room_id == room_id, RoomMember.user_id == user_id))
+    await db.commit()
+    room_members.invalidate(room_id)
+
+
+@router.get("/{room_id}/messages", response_model=list[RoomMessageOut])
+async def get_room_history(
+    room_id: uuid.UUID,
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    before: int | None = Query(None, ge=1, description="Return messages with a lower seq"),
+    current_user: AuthUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Newest first; pass the lowest ``seq`` seen as ``before`` to page back."""
+    await _members_of(room_id, current_user, db)
+    stmt = select(RoomMessage).where(RoomMessage.room_id == room_id).order_by(desc(RoomMessage.seq)).limit(limit)
+    if before is not None:
+        stmt = stmt.where(RoomMessage.seq < before)
+    messages = (await db.execute(stmt)).scalars().all()
+    if len(messages) == limit:
+        response.headers[NEXT_CURSOR_HEADER] = str(messages[-1].seq)
+    return messages
+
+
+@router.post("/{room_id}/messages", response_model=RoomMessageOut, status_code=201)
+async def send_room_message(
+    room_id: uuid.UUID,
+    body: RoomMessageCreate,
+    current_user: AuthUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    await enforce_rate_limit(
+        "message", str(current_user.id), settings.MESSAGE_RATE_PER_SECOND, settings.MESSAGE_RATE_BURST
+    )
+    members = await _members_of(room_id, current_user, db)
+    msg = await post_room_message(db, room_id, current_user.id, body.content)
+    await manager.send_to_users(list(members), room_message_payload(msg, current_user.username))
+    return msg
+
+
+@router.post("/{room_id}/read", status_code=204)
+async def mark_room_read(
+    room_id: uuid.UUID,
+    body: ReadCursor,
+    current_user: AuthUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    await _members_of(room_id, current_user, db)
+    read_receipts.mark_room(current_user.id, room_id, body.seq)
@@ -1,12 +1,30 @@
-from fastapi import APIRouter, Depends
+import uuid
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.deps import get_current_user
+from app.db.session import get_db
 from app.models.user import User
-from app.schemas.user import UserOut
+from app.schemas.user import PresenceOut, UserOut
+from app.services.presence import presence
+from app.services.user_cache import AuthUser
 
 router = APIRouter()
 
 
 @router.get("/me", response_model=UserOut)
-async def me(current_user: User = Depends(get_current_user)):
-    return current_user
+async def me(
+    current_user: AuthUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    return await db.get(User, current_user.id)
+
+
+@router.get("/presence", response_model=PresenceOut)
+async def get_presence(
+    ids: list[uuid.UUID] = Query(..., max_length=200),
+    current_user: AuthUser = Depends(get_current_user),
+):
+    """Current status of up to 200 users, answered from memory."""
+    return PresenceOut(statuses=presence.statuses(ids))
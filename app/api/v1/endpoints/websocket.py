@@ -1,74 +1,243 @@
+import logging
 import uuid
+from datetime import datetime
 
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-from sqlalchemy import select
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import IntegrityError
+from starlette.websockets import WebSocketState
 
-from app.core.security import decode_token
+from app.core.config import settings
+from app.core.deps import get_user_from_token
 from app.db.session import AsyncSessionLocal
-from app.models.message import DirectMessage
-from app.models.user import User
-from app.services.connection_manager import manager
+from app.services.connection_manager import INTERNAL_ERROR_CLOSE_CODE, manager
+from app.services.delivery import message_payload, missed_messages
+from app.services.message_writer import message_writer
+from app.services.presence import presence
+from app.services.rate_limiter import RATE_LIMITED, TokenBucket, rate_limiter
+from app.services.read_receipts import read_receipts
+from app.services.rooms import post_room_message, room_members, room_message_payload
+from app.services.user_cache import AuthUser, known_users
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 
-async def _get_user_from_token(token: str, db: AsyncSession):
-    user_id = decode_token(token)
-    if not user_id:
-        return None
-    result = await db.execute(select(User).where(User.id == uuid.UUID(user_id)))
-    return result.scalar_one_or_none()
+def _rate_limited(conn, retry_after: float):
+    manager.reply(conn, {"error": "Rate limit exceeded", "retry_after": round(retry_after, 3)})
 
 
-@router.websocket("/chat")
-async def websocket_endpoint(websocket: WebSocket, token: str):
+async def _send_message(conn, user: AuthUser, data: dict):
+    recipient_id_str = data.get("recipient_id")
+    content = data.get("content")
+    content = content.strip() if isinstance(content, str) else ""
+
+    if not recipient_id_str or not content:
+        manager.reply(conn, {"error": "recipient_id and content are required"})
+        return
+
+    try:
+        recipient_id = uuid.UUID(recipient_id_str)
+    except (ValueError, TypeError, AttributeError):
+        manager.reply(conn, {"error": "Invalid recipient_id"})
+        return
+
+    # Shared with POST /dm, so switching transports doesn't double the budget
+    retry_after = await rate_limiter.hit(
+        "message", str(user.id), settings.MESSAGE_RATE_PER_SECOND, settings.MESSAGE_RATE_BURST
+    )
+    if retry_after:
+        _rate_limited(conn, retry_after)
+        return
+
+    # Usually answered from memory; unknown ids never reach the writer
+    if not await known_users.exists(recipient_id):
+        manager.reply(conn, {"error": "Recipient not found"})
+        return
+
+    # Persist message (group-committed with other connections')
+    try:
+        msg = await message_writer.write(user.id, recipient_id, content)
+    except IntegrityError:
+        # Deleted since it was cached
+        manager.reply(conn, {"error": "Recipient not found"})
+        return
+
+    # Deliver to recipient (if online) and echo back to sender
+    await manager.send_to_users([recipient_id, user.id], message_payload(msg, user.username))
+
+
+async def _send_room_message(conn, user: AuthUser, data: dict):
+    content = data.get("content")
+    content = content.strip() if isinstance(content, str) else ""
+    try:
+        room_id = uuid.UUID(data.get("room_id", ""))
+    except (ValueError, TypeError, AttributeError):
+        manager.reply(conn, {"error": "Invalid room_id"})
+        return
+    if not content:
+        manager.reply(conn, {"error": "content is required"})
+        return
+
+    retry_after = await rate_limiter.hit(
+        "message", str(user.id), settings.MESSAGE_RATE_PER_SECOND, settings.MESSAGE_RATE_BURST
+    )
+    if retry_after:
+        _rate_limited(conn, retry_after)
+        return
+
     async with AsyncSessionLocal() as db:
-        user = await _get_user_from_token(token, db)
-        if not user:
-            await websocket.close(code=4001)
+        members = await room_members.get(room_id, db)
+        if user.id not in members:
+            manager.reply(conn, {"error": "Room not found"})
             return
+        msg = await post_room_message(db, room_id, user.id, content)
+    # One frame and one publish per node, however many members are online
+    await manager.send_to_users(list(members), room_message_payload(msg, user.username))
+
+
+async def _resume(conn, user: AuthUser, data: dict):
+    """Replay everything after the client's last seen sequence number in one batch."""
+    last_seq = data.get("last_seq", 0)
+    if not isinstance(last_seq, int) or last_seq < 0:
+        manager.reply(conn, {"error": "Invalid last_seq"})
+        return
 
-        await manager.connect(user.id, websocket)
+    limit = settings.RESUME_BATCH_LIMIT
+    async with AsyncSessionLocal() as db:
+        missed = await missed_messages(db, user.id, last_seq, limit)
+    manager.reply(
+        conn,
+        {
+            "type": "resume",
+            "messages": [payload for _, payload in missed],
+            "last_seq": missed[-1][0] if missed else last_seq,
+            # Send another resume from last_seq to fetch the rest
+            "more": len(missed) == limit,
+        },
+    )
+
+
+async def _read(conn, user: AuthUser, data: dict):
+    """Move a read cursor: a DM conversation by ``last_read_at``, a room by ``seq``."""
+    if "room_id" in data:
+        seq = data.get("seq")
         try:
-            while True:
-                data = await websocket.receive_json()
-
-                recipient_id_str = data.get("recipient_id")
-                content = data.get("content", "").strip()
-
-                if not recipient_id_str or not content:
-                    await websocket.send_json({"error": "recipient_id and content are required"})
-                    continue
-
-                try:
-                    recipient_id = uuid.UUID(recipient_id_str)
-                except ValueError:
-                    await websocket.send_json({"error": "Invalid recipient_id"})
-                    continue
-
-                # Persist message
-                msg = DirectMessage(
-                    sender_id=user.id,
-                    recipient_id=recipient_id,
-                    content=content,
-                )
-                db.add(msg)
-                await db.commit()
-                await db.refresh(msg)
-
-                payload = {
-                    "id": str(msg.id),
-                    "sender_id": str(msg.sender_id),
-                    "sender_username": user.username,
-                    "recipient_id": str(msg.recipient_id),
-                    "content": msg.content,
-                    "created_at": msg.created_at.isoformat(),
-                }
-
-                # Deliver to recipient (if online) and echo back to sender
-                await manager.send_to_user(recipient_id, payload)
-                await manager.send_to_user(user.id, payload)
-
-        except WebSocketDisconnect:
-            manager.disconnect(user.id, websocket)
+            room_id = uuid.UUID(data["room_id"])
+        except (ValueError, TypeError, AttributeError):
+            manager.reply(conn, {"error": "Invalid room_id"})
+            return
+        if not isinstance(seq, int) or seq < 0:
+            manager.reply(conn, {"error": "Invalid seq"})
+            return
+        async with AsyncSessionLocal() as db:
+            members = await room_members.get(room_id, db)
+        if user.id not in members:
+            manager.reply(conn, {"error": "Room not found"})
+            return
+        read_receipts.mark_room(user.id, room_id, seq)
+        return
+
+    try:
+        partner_id = uuid.UUID(data.get("user_id", ""))
+        read_at = datetime.fromisoformat(data.get("last_read_at", ""))
+    except (ValueError, TypeError, AttributeError):
+        manager.reply(conn, {"error": "user_id and last_read_at are required"})
+        return
+    if read_at.tzinfo is None:
+        manager.reply(conn, {"error": "last_read_at needs a timezone"})
+        return
+    read_receipts.mark_direct(user.id, partner_id, read_at)
+
+
+async def _set_presence(conn, user: AuthUser, data: dict):
+    status = data.get("status")
+    if status not in ("online", "away"):
+        manager.reply(conn, {"error": "status must be online or away"})
+        return
+    manager.set_away(conn, status == "away")
+
+
+async def _watch(conn, user: AuthUser, data: dict):
+    """Start (or replace) presence updates for a list of users."""
+    try:
+        user_ids = [str(uuid.UUID(u)) for u in data.get("user_ids")]
+    except (ValueError, TypeError, AttributeError):
+        manager.reply(conn, {"error": "user_ids must be a list of ids"})
+        return
+    manager.reply(conn, {"type": "presence", "statuses": presence.watch(conn, user_ids)})
+
+
+async def _typing(conn, user: AuthUser, data: dict):
+    try:
+        recipient_id = uuid.UUID(data.get("recipient_id", ""))
+    except (ValueError, TypeError, AttributeError):
+        manager.reply(conn, {"error": "Invalid recipient_id"})
+        return
+    await presence.typing(user.id, recipient_id, data.get("typing", True) is not False)
+
+
+async def _pong(conn, user: AuthUser, data: dict):
+    # Receiving it already refreshed the socket's last_seen
+    pass
+
+
+_HANDLERS = {
+    "pong": _pong,
+    "message": _send_message,
+    "room_message": _send_room_message,
+    "resume": _resume,
+    "read": _read,
+    "presence": _set_presence,
+    "watch": _watch,
+    "typing": _typing,
+}
+
+
+@router.websocket("/chat")
+async def websocket_endpoint(websocket: WebSocket, token: str):
+    # Only hold a pooled connection for the handshake lookup; messages go
+    # through the shared writer, so an idle socket pins nothing
+    async with AsyncSessionLocal() as db:
+        user = await get_user_from_token(token, db)
+    if not user:
+        await websocket.close(code=4001)
+        return
+
+    conn = await manager.connect(user.id, websocket)
+    if conn is None:
+        return
+    # Per socket and local to this worker: covers every frame type, not just messages
+    frames = TokenBucket(settings.WS_FRAME_RATE_PER_SECOND, settings.WS_FRAME_RATE_BURST)
+    try:
+        while True:
+            try:
+                data = await manager.receive(conn)
+            except (ValueError, TypeError):
+                manager.reply(conn, {"error": "Invalid frame"})
+                continue
+            retry_after = frames.take()
+            if retry_after:
+                RATE_LIMITED.inc(scope="ws_frame")
+                _rate_limited(conn, retry_after)
+                continue
+            if not isinstance(data, dict):
+                manager.reply(conn, {"error": "Invalid frame"})
+                continue
+
+            handler = _HANDLERS.get(data.get("type", "message"))
+            if handler is None:
+                manager.reply(conn, {"error": "Unknown frame type"})
+                continue
+            await handler(conn, user, data)
+
+    except WebSocketDisconnect:
+        pass
+    except Exception:
+        # Sockets the manager closed itself (idle, slow) end up here too
+        if websocket.application_state == WebSocketState.CONNECTED:
+            logger.exception("websocket: closing after unexpected error")
+            await manager.close(conn, INTERNAL_ERROR_CLOSE_CODE)
+    finally:
+        manager.disconnect(conn)
+        presence.unwatch(conn)
@@ -6,6 +6,114 @@ class Settings(BaseSettings):
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60
+    # Exchanged at /auth/refresh for new tokens without the password
+    REFRESH_TOKEN_EXPIRE_DAYS: int = 30
+
+    # Connection pool; set DB_STATEMENT_CACHE_SIZE=0 behind pgbouncer in
+    # transaction mode
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_CACHE_SIZE: int = 100
+
+    # Cross-worker WebSocket fan-out: "memory" (single process) or "postgres"
+    BACKPLANE: str = "memory"
+    BACKPLANE_HEARTBEAT_SECONDS: float = 10.0
+    NODE_ID: str | None = None
+
+    # Per-socket outbound queue; on overflow "drop_oldest" or "disconnect"
+    WS_SEND_QUEUE_SIZE: int = 256
+    WS_OVERFLOW_POLICY: str = "drop_oldest"
+    # Sockets quiet for WS_PING_INTERVAL_SECONDS get {"type": "ping"}; sockets
+    # that send nothing (not even {"type": "pong"}) for WS_IDLE_TIMEOUT_SECONDS
+    # are closed
+    WS_PING_INTERVAL_SECONDS: float = 25.0
+    WS_IDLE_TIMEOUT_SECONDS: float = 75.0
+    WS_MAX_CONNECTIONS_PER_USER: int = 10
+
+    # bcrypt runs off the event loop: executor kind ("thread" or "process"),
+    # pool size and the number of hashes allowed in flight at once
+    PASSWORD_HASH_EXECUTOR: str = "thread"
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_CONCURRENCY: int = 8
+
+    # In-process cache of token claims and authenticated users. Only ORM
+    # updates on this worker evict a user; bulk UPDATEs, other workers and
+    # manual SQL are seen after USER_CACHE_TTL_SECONDS, so a deactivated user
+    # keeps authenticating for up to that long
+    USER_CACHE_SIZE: int = 10_000
+    USER_CACHE_TTL_SECONDS: float = 60.0
+    # Verified access tokens, keyed by digest; never kept past their exp
+    TOKEN_CACHE_SIZE: int = 50_000
+    TOKEN_CACHE_TTL_SECONDS: float = 300.0
+    # Ids known to exist, checked before accepting a message; unknown ids
+    # are remembered only briefly so new users become reachable quickly
+    KNOWN_USERS_CACHE_SIZE: int = 100_000
+    KNOWN_USERS_TTL_SECONDS: float = 3600.0
+    UNKNOWN_USERS_TTL_SECONDS: float = 5.0
+
+    # Group commit for new messages: flush after this many or this long
+    MESSAGE_BATCH_SIZE: int = 100
+    MESSAGE_BATCH_DELAY_MS: float = 5.0
+
+    # Most messages accepted by one POST /messages/dm/batch, and how long
+    # their idempotency keys are remembered
+    SEND_BATCH_MAX_MESSAGES: int = 100
+    IDEMPOTENCY_KEY_TTL_HOURS: float = 24.0
+
+    # Most messages returned by one WebSocket resume reply
+    RESUME_BATCH_LIMIT: int = 500
+
+    # direct_messages is partitioned by month; keep this many future months
+    # created, checking every MESSAGE_PARTITION_CHECK_HOURS. Inserts into a
+    # month that doesn't exist fail, so don't let this run out
+    MESSAGE_PARTITION_MONTHS_AHEAD: int = 2
+    MESSAGE_PARTITION_CHECK_HOURS: float = 12.0
+
+    # Read cursors are buffered per worker and written in batches
+    READ_FLUSH_INTERVAL_SECONDS: float = 1.0
+    READ_FLUSH_MAX_PENDING: int = 5000
+
+    # Group rooms: member lists are cached per worker for fan-out
+    ROOM_MAX_MEMBERS: int = 1000
+    ROOM_MEMBER_CACHE_SIZE: int = 10_000
+    ROOM_MEMBER_CACHE_TTL_SECONDS: float = 30.0
+
+    # Presence updates to watchers are batched and debounced over this window
+    PRESENCE_DEBOUNCE_SECONDS: float = 2.0
+    PRESENCE_MAX_WATCH: int = 500
+    # At most one "typing" frame per sender/recipient pair per window;
+    # clients should show the indicator a little longer than this
+    TYPING_COALESCE_SECONDS: float = 3.0
+
+    # Token-bucket rate limits. "memory" keeps buckets per worker; "redis"
+    # shares them across workers (needs the redis package)
+    RATE_LIMIT_BACKEND: str = "memory"
+    RATE_LIMIT_REDIS_URL: str = "redis://localhost:6379/0"
+    RATE_LIMIT_MAX_KEYS: int = 100_000
+    # Messages per user, over REST and WebSocket combined
+    MESSAGE_RATE_PER_SECOND: float = 5.0
+    MESSAGE_RATE_BURST: int = 20
+    # Batch send requests per user. Batches are not charged to the message
+    # limit above: this replaces it, allowing up to
+    # SEND_BATCH_RATE_BURST * SEND_BATCH_MAX_MESSAGES messages at once
+    SEND_BATCH_RATE_PER_SECOND: float = 1.0
+    SEND_BATCH_RATE_BURST: int = 5
+    # Frames of any type per WebSocket connection
+    WS_FRAME_RATE_PER_SECOND: float = 20.0
+    WS_FRAME_RATE_BURST: int = 60
+    # Login attempts per client address and per (username, client address)
+    LOGIN_RATE_PER_MINUTE: float = 10.0
+    LOGIN_RATE_BURST: int = 10
+    # Comma-separated addresses of reverse proxies / load balancers whose
+    # X-Forwarded-For is trusted for the client address
+    TRUSTED_PROXIES: str = ""
+
+    # Rows per page of the streaming history export; each page is its own
+    # short transaction
+    EXPORT_BATCH_SIZE: int = 1000
 
     class Config:
         env_file = ".env"
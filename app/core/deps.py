@@ -1,28 +1,67 @@
-import uuid
+import math
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
-from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.security import decode_token
+from app.core.config import settings
 from app.db.session import get_db
-from app.models.user import User
+from app.services.rate_limiter import rate_limiter
+from app.services.user_cache import AuthUser, user_cache
 
 bearer_scheme = HTTPBearer()
 
 
+async def get_user_from_token(token: str, db: AsyncSession) -> AuthUser | None:
+    user_id = user_cache.user_id_from_token(token)
+    if not user_id:
+        return None
+    user = await user_cache.get_user(user_id, db)
+    if not user or not user.is_active:
+        return None
+    return user
+
+
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
     db: AsyncSession = Depends(get_db),
-) -> User:
+) -> AuthUser:
     token = credentials.credentials
-    user_id = decode_token(token)
+    user_id = user_cache.user_id_from_token(token)
     if not user_id:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
 
-    result = await db.execute(select(User).where(User.id == uuid.UUID(user_id)))
-    user = result.scalar_one_or_none()
+    user = await user_cache.get_user(user_id, db)
     if not user or not user.is_active:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
     return user
+
+
+def client_address(request: Request) -> str | None:
+    """The caller's address, looking through TRUSTED_PROXIES.
+
+    X-Forwarded-For is read right to left and the first hop that isn't a
+    trusted proxy wins; anything further left is client-supplied.
+    """
+    if request.client is None:
+        return None
+    trusted = {addr.strip() for addr in settings.TRUSTED_PROXIES.split(",") if addr.strip()}
+    address = request.client.host
+    if address in trusted:
+        for hop in reversed(request.headers.get("x-forwarded-for", "").split(",")):
+            hop = hop.strip()
+            if hop:
+                address = hop
+                if hop not in trusted:
+                    break
+    return address
+
+
+async def enforce_rate_limit(scope: str, key: str, rate: float, burst: int):
+    retry_after = await rate_limiter.hit(scope, key, rate, burst)
+    if retry_after:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many requests",
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
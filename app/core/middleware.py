@@ -0,0 +1,52 @@
+import time
+
+from app.core.metrics import registry
+from app.db.session import DbUsage, request_db_usage
+
+HTTP_REQUEST_SECONDS = registry.histogram(
+    "chatapp_http_request_seconds", "HTTP request latency by route", ("method", "route", "status")
+)
+HTTP_REQUEST_DB_QUERIES = registry.histogram(
+    "chatapp_http_request_db_queries",
+    "Database queries issued per HTTP request",
+    ("route",),
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 50),
+)
+HTTP_REQUEST_DB_SECONDS = registry.histogram(
+    "chatapp_http_request_db_seconds", "Time spent in database queries per HTTP request", ("route",)
+)
+
+
+class MetricsMiddleware:
+    """Records latency and database usage of every HTTP request by route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        usage = DbUsage()
+        token = request_db_usage.set(usage)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            request_db_usage.reset(token)
+            # The route template, not the raw path, keeps label cardinality bounded
+            route = scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            HTTP_REQUEST_SECONDS.observe(elapsed, method=scope["method"], route=path, status=status)
+            HTTP_REQUEST_DB_QUERIES.observe(usage.queries, route=path)
+            HTTP_REQUEST_DB_SECONDS.observe(usage.seconds, route=path)
@@ -14,17 +14,31 @@ def verify_password(plain: str, hashed: str) -> bool:
     return bcrypt.checkpw(plain.encode(), hashed.encode())
 
 
-def create_access_token(subject: str) -> str:
-    expire = datetime.now(timezone.utc) + timedelta(
-        minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES
-    )
-    payload = {"sub": subject, "exp": expire}
+ACCESS_TOKEN = "access"
+REFRESH_TOKEN = "refresh"
+
+
+def _create_token(subject: str, typ: str, lifetime: timedelta) -> str:
+    payload = {"sub": subject, "typ": typ, "exp": datetime.now(timezone.utc) + lifetime}
     return jwt.encode(payload, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
 
 
-def decode_token(token: str) -> str:
+def create_access_token(subject: str) -> str:
+    return _create_token(subject, ACCESS_TOKEN, timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES))
+
+
+def create_refresh_token(subject: str) -> str:
+    return _create_token(subject, REFRESH_TOKEN, timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS))
+
+
+def decode_token_claims(token: str, typ: str = ACCESS_TOKEN) -> dict | None:
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        return payload["sub"]
     except JWTError:
         return None
+    if "sub" not in payload:
+        return None
+    # Tokens issued before the typ claim existed are access tokens
+    if payload.get("typ", ACCESS_TOKEN) != typ:
+        return None
+    return payload
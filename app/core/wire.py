@@ -0,0 +1,72 @@
+import json
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON_SUBPROTOCOL = "chat.json.v1"
+MSGPACK_SUBPROTOCOL = "chat.msgpack.v1"
+
+
+def dumps(data) -> str:
+    if orjson is not None:
+        return orjson.dumps(data).decode()
+    return json.dumps(data, separators=(",", ":"))
+
+
+def loads(raw: str | bytes):
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def negotiate(offered: list[str]) -> str | None:
+    """Pick the subprotocol to accept from the client's offer, if any."""
+    if MSGPACK_SUBPROTOCOL in offered and msgpack is not None:
+        return MSGPACK_SUBPROTOCOL
+    if JSON_SUBPROTOCOL in offered:
+        return JSON_SUBPROTOCOL
+    return None
+
+
+def decode_frame(raw: str | bytes, subprotocol: str | None):
+    if subprotocol == MSGPACK_SUBPROTOCOL:
+        return msgpack.unpackb(raw)
+    return loads(raw)
+
+
+class Frame:
+    """A payload encoded at most once per wire format and shared by every socket."""
+
+    __slots__ = ("data", "_text", "_text_size", "_packed")
+
+    def __init__(self, data: dict):
+        self.data = data
+        self._text: str | None = None
+        self._text_size: int | None = None
+        self._packed: bytes | None = None
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = dumps(self.data)
+        return self._text
+
+    @property
+    def text_size(self) -> int:
+        """UTF-8 length of ``text``, i.e. what a text frame puts on the wire."""
+        if self._text_size is None:
+            self._text_size = len(self.text.encode())
+        return self._text_size
+
+    @property
+    def packed(self) -> bytes:
+        if self._packed is None:
+            self._packed = msgpack.packb(self.data)
+        return self._packed
@@ -1,12 +1,91 @@
+import time
+from contextvars import ContextVar
+
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from app.core.config import settings
+from app.core.metrics import registry
+
+DB_QUERY_SECONDS = registry.histogram("chatapp_db_query_seconds", "Database query duration")
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long checkouts wait for a connection."""
+
+    # Class attributes so the counters survive pool.recreate()
+    checkouts = 0
+    wait_seconds_total = 0.0
+    wait_seconds_max = 0.0
+    timeouts = 0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except Exception:
+            TimedQueuePool.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            TimedQueuePool.checkouts += 1
+            TimedQueuePool.wait_seconds_total += waited
+            TimedQueuePool.wait_seconds_max = max(TimedQueuePool.wait_seconds_max, waited)
 
-engine = create_async_engine(settings.DATABASE_URL, echo=False)
+
+engine = create_async_engine(
+    settings.DATABASE_URL,
+    echo=False,
+    poolclass=TimedQueuePool,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
+    connect_args={"statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE},
+)
 AsyncSessionLocal = async_sessionmaker(engine, expire_on_commit=False)
 
 
+class DbUsage:
+    """Queries issued and time spent in them, accumulated for one request."""
+
+    __slots__ = ("queries", "seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+
+# Set by MetricsMiddleware; mutated (not re-set) from engine events, which
+# run in a greenlet that shares the request's context
+request_db_usage: ContextVar[DbUsage | None] = ContextVar("request_db_usage", default=None)
+
+
+@event.listens_for(engine.sync_engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(engine.sync_engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    DB_QUERY_SECONDS.observe(elapsed)
+    usage = request_db_usage.get()
+    if usage is not None:
+        usage.queries += 1
+        usage.seconds += elapsed
+
+
+@event.listens_for(engine.sync_engine, "handle_error")
+def _handle_error(exception_context):
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("query_start"):
+        conn.info["query_start"].pop()
+
+
 class Base(DeclarativeBase):
     pass
 
@@ -14,3 +93,16 @@ class Base(DeclarativeBase):
 async def get_db() -> AsyncSession:
     async with AsyncSessionLocal() as session:
         yield session
+
+
+def pool_stats() -> dict:
+    pool = engine.pool
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "checkouts": TimedQueuePool.checkouts,
+        "wait_seconds_total": TimedQueuePool.wait_seconds_total,
+        "wait_seconds_max": TimedQueuePool.wait_seconds_max,
+        "timeouts": TimedQueuePool.timeouts,
+    }
@@ -1,24 +1,113 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+
+from app.api.v1.endpoints import auth, users, messages, rooms, websocket
+from app.core.metrics import registry
+from app.core.pagination import NEXT_CURSOR_HEADER
+from app.core.middleware import MetricsMiddleware
+from app.db.session import TimedQueuePool, engine, pool_stats
+from app.services.connection_manager import manager
+from app.services.message_writer import message_writer
+from app.services.partitions import partition_maintainer
+from app.services.password_hasher import password_hasher
+from app.services.presence import presence
+from app.services.rate_limiter import rate_limiter
+from app.services.read_receipts import read_receipts
+from app.services.rooms import room_members
+from app.services.user_cache import known_users, user_cache
+
 
-from app.api.v1.endpoints import auth, users, messages, websocket
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await partition_maintainer.start()
+    await manager.start()
+    await message_writer.start()
+    await read_receipts.start()
+    yield
+    await message_writer.stop()
+    await read_receipts.stop()
+    await partition_maintainer.stop()
+    await manager.stop()
+    password_hasher.shutdown()
+    await rate_limiter.close()
 
-app = FastAPI(title="ChatApp", version="1.0.0")
 
+app = FastAPI(title="ChatApp", version="1.0.0", lifespan=lifespan)
+
+app.add_middleware(MetricsMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 app.include_router(auth.router, prefix="/api/v1/auth", tags=["auth"])
 app.include_router(users.router, prefix="/api/v1/users", tags=["users"])
 app.include_router(messages.router, prefix="/api/v1/messages", tags=["messages"])
+app.include_router(rooms.router, prefix="/api/v1/rooms", tags=["rooms"])
 app.include_router(websocket.router, prefix="/ws", tags=["websocket"])
 
 
+registry.gauge(
+    "chatapp_ws_connections", "Open WebSocket connections on this worker",
+    lambda: manager.stats()["connections"],
+)
+registry.gauge(
+    "chatapp_ws_queued_frames", "Frames waiting in per-socket send queues",
+    lambda: manager.stats()["queued"],
+)
+registry.counter_from(
+    "chatapp_ws_dropped_frames_total", "Frames dropped by the overflow policy", lambda: manager.dropped
+)
+registry.counter_from(
+    "chatapp_ws_slow_disconnects_total", "Sockets closed for not keeping up", lambda: manager.slow_disconnects
+)
+registry.gauge(
+    "chatapp_db_pool_checked_out", "Pooled connections in use", lambda: engine.pool.checkedout()
+)
+registry.counter_from(
+    "chatapp_db_pool_wait_seconds_total", "Time spent waiting for a pooled connection",
+    lambda: TimedQueuePool.wait_seconds_total,
+)
+registry.counter_from(
+    "chatapp_db_pool_timeouts_total", "Pool checkouts that failed", lambda: TimedQueuePool.timeouts
+)
+registry.gauge(
+    "chatapp_message_writer_pending", "Messages waiting for the next batch",
+    lambda: message_writer.stats()["pending"],
+)
+registry.gauge(
+    "chatapp_password_hash_waiting", "bcrypt calls waiting for a worker", lambda: password_hasher.waiting
+)
+
+
 @app.get("/health")
 async def health():
     return {"status": "ok"}
+
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/stats")
+async def stats():
+    return {
+        "websocket": manager.stats(),
+        "db_pool": pool_stats(),
+        "message_writer": message_writer.stats(),
+        "password_hasher": password_hasher.stats(),
+        "user_cache": user_cache.stats(),
+        "known_users": known_users.stats(),
+        "rate_limiter": rate_limiter.stats(),
+        "presence": presence.stats(),
+        "room_members": room_members.stats(),
+        "read_receipts": read_receipts.stats(),
+    }
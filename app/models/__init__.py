@@ -1,4 +1,19 @@
 from app.models.user import User
 from app.models.message import DirectMessage
+from app.models.conversation import Conversation
+from app.models.delivery_sequence import DeliverySequence
+from app.models.backplane_payload import BackplanePayload
+from app.models.idempotency_key import MessageIdempotencyKey
+from app.models.room import Room, RoomMember, RoomMessage
 
-__all__ = ["User", "DirectMessage"]
+__all__ = [
+    "User",
+    "DirectMessage",
+    "Conversation",
+    "DeliverySequence",
+    "BackplanePayload",
+    "MessageIdempotencyKey",
+    "Room",
+    "RoomMember",
+    "RoomMessage",
+]
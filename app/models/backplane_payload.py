@@ -0,0 +1,25 @@
+import uuid
+from datetime import datetime
+
+from sqlalchemy import DateTime, Text, func
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.session import Base
+
+
+class BackplanePayload(Base):
+    """A backplane message too large for NOTIFY, sent as a reference to this row.
+
+    Unlogged: rows live for about a minute and losing them in a crash is
+    no worse than losing the NOTIFY itself.
+    """
+
+    __tablename__ = "backplane_payloads"
+    __table_args__ = {"prefixes": ["UNLOGGED"]}
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True)
+    payload: Mapped[str] = mapped_column(Text, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
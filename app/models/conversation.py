@@ -0,0 +1,42 @@
+import uuid
+from datetime import datetime
+
+from sqlalchemy import CheckConstraint, DateTime, ForeignKey, Index, Integer
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.session import Base
+
+
+def ordered_pair(a: uuid.UUID, b: uuid.UUID) -> tuple[uuid.UUID, uuid.UUID]:
+    # Python and Postgres order UUIDs the same way (by their 128-bit value)
+    return (a, b) if a <= b else (b, a)
+
+
+class Conversation(Base):
+    """Inbox state for one user pair, maintained on every message write.
+
+    ``user_a_id`` is always the smaller id of the pair; the ``_a``/``_b``
+    columns hold each side's unread count and read marker.
+    """
+
+    __tablename__ = "conversations"
+    __table_args__ = (
+        CheckConstraint("user_a_id <= user_b_id", name="ck_conversations_ordered_pair"),
+        Index("ix_conversations_user_a_last_at", "user_a_id", "last_at"),
+        Index("ix_conversations_user_b_last_at", "user_b_id", "last_at"),
+    )
+
+    user_a_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True
+    )
+    user_b_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True
+    )
+    last_message_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), nullable=False)
+    last_sender_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), nullable=False)
+    last_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    unread_a: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    unread_b: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    last_read_a_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+    last_read_b_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
@@ -0,0 +1,22 @@
+import uuid
+
+from sqlalchemy import BigInteger, ForeignKey
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.session import Base
+
+
+class DeliverySequence(Base):
+    """Last delivery sequence number handed out for each user.
+
+    Every message a user sends or receives takes the next number, so a
+    reconnecting client can ask for everything after the last one it saw.
+    """
+
+    __tablename__ = "delivery_sequences"
+
+    user_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True
+    )
+    seq: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
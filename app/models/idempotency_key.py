@@ -0,0 +1,30 @@
+import uuid
+from datetime import datetime
+
+from sqlalchemy import DateTime, ForeignKey, Index, String, func
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.session import Base
+
+
+class MessageIdempotencyKey(Base):
+    """Client-chosen key of a message a sender already stored.
+
+    Kept outside the partitioned ``direct_messages`` table, where a unique
+    index would have to include ``created_at``. Rows are written in the
+    message's transaction, so ``created_at`` equals the message's and locates
+    its partition.
+    """
+
+    __tablename__ = "message_idempotency_keys"
+    __table_args__ = (Index("ix_message_idempotency_keys_created_at", "created_at"),)
+
+    sender_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True
+    )
+    key: Mapped[str] = mapped_column(String(100), primary_key=True)
+    message_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
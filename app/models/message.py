@@ -1,28 +1,82 @@
+import hashlib
 import uuid
 from datetime import datetime
 
-from sqlalchemy import DateTime, ForeignKey, String, Text, func
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import BigInteger, Computed, DateTime, ForeignKey, Index, String, Text, func
+from sqlalchemy.dialects.postgresql import TSVECTOR, UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
+from app.core.ids import uuid7
 from app.db.session import Base
+from app.models.conversation import ordered_pair
+
+# Must stay in sync with conversation_key() below
+CONVERSATION_KEY_SQL = (
+    "md5(LEAST(sender_id, recipient_id)::text || ':' || "
+    "GREATEST(sender_id, recipient_id)::text)::uuid"
+)
+
+
+# Text search configuration of search_vector; queries must use the same one.
+# 'simple' only lowercases, so it works for any language mix
+SEARCH_CONFIG = "simple"
+SEARCH_VECTOR_SQL = f"to_tsvector('{SEARCH_CONFIG}', content)"
+
+
+def conversation_key(a: uuid.UUID, b: uuid.UUID) -> uuid.UUID:
+    """Key shared by every message between ``a`` and ``b``, in either direction."""
+    lo, hi = ordered_pair(a, b)
+    return uuid.UUID(hashlib.md5(f"{lo}:{hi}".encode()).hexdigest())
 
 
 class DirectMessage(Base):
     __tablename__ = "direct_messages"
+    __table_args__ = (
+        Index(
+            "ix_direct_messages_sender_recipient_created",
+            "sender_id", "recipient_id", "created_at", "id",
+        ),
+        Index(
+            "ix_direct_messages_recipient_sender_created",
+            "recipient_id", "sender_id", "created_at", "id",
+        ),
+        Index(
+            "ix_direct_messages_conversation_created",
+            "conversation_key", "created_at", "id",
+        ),
+        Index("ix_direct_messages_recipient_seq", "recipient_id", "recipient_seq"),
+        Index("ix_direct_messages_sender_seq", "sender_id", "sender_seq"),
+        Index("ix_direct_messages_search_vector", "search_vector", postgresql_using="gin"),
+        # Monthly partitions, created by direct_messages_ensure_partitions()
+        # (see alembic 0007 and app.services.partitions)
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(
-        UUID(as_uuid=True), primary_key=True, default=uuid.uuid4
+        UUID(as_uuid=True), primary_key=True, default=uuid7
     )
     sender_id: Mapped[uuid.UUID] = mapped_column(
-        UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True
+        UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False
     )
     recipient_id: Mapped[uuid.UUID] = mapped_column(
-        UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True
+        UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False
+    )
+    conversation_key: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), Computed(CONVERSATION_KEY_SQL, persisted=True)
     )
     content: Mapped[str] = mapped_column(Text, nullable=False)
+    # Only read by search; deferred so history queries don't ship it
+    search_vector: Mapped[str] = mapped_column(
+        TSVECTOR, Computed(SEARCH_VECTOR_SQL, persisted=True), deferred=True
+    )
+    # Position in each side's delivery sequence; NULL for messages written
+    # before sequences existed
+    sender_seq: Mapped[int | None] = mapped_column(BigInteger)
+    recipient_seq: Mapped[int | None] = mapped_column(BigInteger)
+    # Part of the primary key because it is the partition key; filter on it
+    # wherever possible so the planner can skip partitions
     created_at: Mapped[datetime] = mapped_column(
-        DateTime(timezone=True), server_default=func.now(), index=True
+        DateTime(timezone=True), server_default=func.now(), primary_key=True
     )
 
     sender: Mapped["User"] = relationship(
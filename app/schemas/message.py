@@ -1,7 +1,7 @@
 import uuid
 from datetime import datetime
 
-from pydantic import BaseModel
+from pydantic import AwareDatetime, BaseModel, Field
 
 
 class DMCreate(BaseModel):
@@ -15,12 +15,45 @@ class DMOut(BaseModel):
     recipient_id: uuid.UUID
     content: str
     created_at: datetime
+    sender_seq: int | None = None
+    recipient_seq: int | None = None
 
     model_config = {"from_attributes": True}
 
 
+class DMBatchItem(DMCreate):
+    # Retrying with the same key returns the original message instead of a copy
+    idempotency_key: str | None = Field(None, min_length=1, max_length=100)
+
+
+class DMBatchCreate(BaseModel):
+    messages: list[DMBatchItem] = Field(min_length=1)
+
+
+class DMBatchResult(DMOut):
+    # True when the idempotency key had already been used
+    duplicate: bool = False
+
+
+class MessageSearchHit(DMOut):
+    snippet: str
+
+
 class ConversationOut(BaseModel):
     user_id: uuid.UUID
     username: str
-    last_message: str
+    last_message: str | None = None
     last_at: datetime
+    unread: int = 0
+
+
+class DMReadCursor(BaseModel):
+    user_id: uuid.UUID
+    # created_at of the newest message read in the conversation
+    last_read_at: AwareDatetime
+
+
+class UnreadOut(BaseModel):
+    direct: int
+    rooms: int
+    total: int
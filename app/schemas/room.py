@@ -0,0 +1,40 @@
+import uuid
+from datetime import datetime
+
+from pydantic import BaseModel, Field
+
+
+class RoomCreate(BaseModel):
+    name: str = Field(min_length=1, max_length=100)
+    member_ids: list[uuid.UUID] = []
+
+
+class RoomOut(BaseModel):
+    id: uuid.UUID
+    name: str
+    last_seq: int
+    last_at: datetime
+    unread: int = 0
+
+
+class RoomMemberAdd(BaseModel):
+    user_id: uuid.UUID
+
+
+class RoomMessageCreate(BaseModel):
+    content: str = Field(min_length=1)
+
+
+class RoomMessageOut(BaseModel):
+    id: uuid.UUID
+    room_id: uuid.UUID
+    sender_id: uuid.UUID | None
+    seq: int
+    content: str
+    created_at: datetime
+
+    model_config = {"from_attributes": True}
+
+
+class ReadCursor(BaseModel):
+    seq: int = Field(ge=0)
@@ -12,3 +12,8 @@ class UserOut(BaseModel):
     created_at: datetime
 
     model_config = {"from_attributes": True}
+
+
+class PresenceOut(BaseModel):
+    # user id -> "online" | "away" | "offline"
+    statuses: dict[str, str]
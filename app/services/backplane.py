@@ -0,0 +1,430 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import socket
+import time
+import uuid
+from collections import defaultdict
+from typing import Awaitable, Callable
+
+from sqlalchemy.engine import make_url
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Called with (user_ids, data) to deliver a payload to this node's local sockets
+Deliver = Callable[[list[str], dict], Awaitable[None]]
+# Called with the users whose presence may have changed
+PresenceChanged = Callable[[list[str]], None]
+
+# Postgres rejects NOTIFY payloads of 8000 bytes or more
+_NOTIFY_MAX_BYTES = 7999
+_JOIN_CHUNK = 100
+# Recipients per deliver message; 100 ids take about 4 KB of the payload
+_DELIVER_CHUNK = 100
+
+
+def default_node_id() -> str:
+    return settings.NODE_ID or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+
+class RoutingTable:
+    """Which nodes currently hold at least one socket for which users."""
+
+    def __init__(self):
+        self._nodes_by_user: dict[str, set[str]] = {}
+        self._users_by_node: dict[str, set[str]] = defaultdict(set)
+
+    def add(self, node_id: str, user_id: str):
+        self._nodes_by_user.setdefault(user_id, set()).add(node_id)
+        self._users_by_node[node_id].add(user_id)
+
+    def remove(self, node_id: str, user_id: str):
+        nodes = self._nodes_by_user.get(user_id)
+        if nodes is not None:
+            nodes.discard(node_id)
+            if not nodes:
+                del self._nodes_by_user[user_id]
+        users = self._users_by_node.get(node_id)
+        if users is not None:
+            users.discard(user_id)
+
+    def drop_node(self, node_id: str):
+        for user_id in self._users_by_node.pop(node_id, set()):
+            nodes = self._nodes_by_user.get(user_id)
+            if nodes is not None:
+                nodes.discard(node_id)
+                if not nodes:
+                    del self._nodes_by_user[user_id]
+
+    def users_for(self, node_id: str) -> list[str]:
+        return list(self._users_by_node.get(node_id, ()))
+
+    def nodes_for(self, user_id: str) -> set[str]:
+        return self._nodes_by_user.get(user_id, set())
+
+    def nodes(self) -> list[str]:
+        return list(self._users_by_node)
+
+
+class Backplane:
+    """Routes payloads for users whose sockets live on other nodes.
+
+    Each node announces the users it holds sockets for on a shared control
+    channel, so every node keeps a routing table and publishes a payload only
+    to the nodes that hold a recipient. Subclasses provide the transport via
+    ``_open``, ``_close``, ``_broadcast`` and ``_send``.
+    """
+
+    def __init__(self, node_id: str | None = None):
+        self.node_id = node_id or default_node_id()
+        self.routes = RoutingTable()
+        self._local_users: set[str] = set()
+        # user_id -> nodes (this one included) where every socket of the user is away
+        self._away: dict[str, set[str]] = {}
+        self._last_seen: dict[str, float] = {}
+        self._deliver: Deliver | None = None
+        self.on_presence: PresenceChanged | None = None
+        self._running = False
+        self._tasks: set[asyncio.Task] = set()
+        self._heartbeat: asyncio.Task | None = None
+
+    async def start(self, deliver: Deliver):
+        self._deliver = deliver
+        await self._open()
+        self._running = True
+        await self._broadcast({"op": "hello", "node": self.node_id})
+        self._heartbeat = asyncio.create_task(self._heartbeat_loop())
+
+    async def stop(self):
+        if not self._running:
+            return
+        self._running = False
+        if self._heartbeat:
+            self._heartbeat.cancel()
+        try:
+            await self._broadcast({"op": "bye", "node": self.node_id})
+        except Exception:
+            logger.exception("backplane: failed to announce shutdown")
+        await self._close()
+
+    def join(self, user_id: str):
+        self._local_users.add(user_id)
+        self._spawn(self._broadcast({"op": "join", "node": self.node_id, "users": [user_id]}))
+        self._presence_changed([user_id])
+
+    def leave(self, user_id: str):
+        self._local_users.discard(user_id)
+        self._clear_away(user_id, self.node_id)
+        self._spawn(self._broadcast({"op": "leave", "node": self.node_id, "user": user_id}))
+        self._presence_changed([user_id])
+
+    def set_away(self, user_id: str, away: bool):
+        """Record whether all of this node's sockets for ``user_id`` are away."""
+        if away:
+            self._away.setdefault(user_id, set()).add(self.node_id)
+        else:
+            self._clear_away(user_id, self.node_id)
+        self._spawn(self._broadcast({"op": "away", "node": self.node_id, "user": user_id, "away": away}))
+        self._presence_changed([user_id])
+
+    def status(self, user_id: str) -> str:
+        """Cluster-wide presence: online, away (on every node holding the user) or offline."""
+        nodes = set(self.routes.nodes_for(user_id))
+        if user_id in self._local_users:
+            nodes.add(self.node_id)
+        if not nodes:
+            return "offline"
+        if nodes <= self._away.get(user_id, set()):
+            return "away"
+        return "online"
+
+    async def publish(self, user_ids: list[str], data: dict):
+        """Send ``data`` once to every other node holding a socket for ``user_ids``."""
+        targets: dict[str, list[str]] = defaultdict(list)
+        for user_id in user_ids:
+            for node_id in self.routes.nodes_for(user_id):
+                if node_id != self.node_id:
+                    targets[node_id].append(user_id)
+        for node_id, users in targets.items():
+            for i in range(0, len(users), _DELIVER_CHUNK):
+                chunk = users[i : i + _DELIVER_CHUNK]
+                try:
+                    await self._send(node_id, {"op": "deliver", "node": self.node_id, "users": chunk, "data": data})
+                except Exception:
+                    logger.exception("backplane: failed to publish to node %s", node_id)
+
+    async def _handle(self, msg: dict):
+        node_id = msg.get("node")
+        if node_id == self.node_id:
+            return
+        op = msg.get("op")
+        self._last_seen[node_id] = time.monotonic()
+        if op == "deliver":
+            await self._deliver(msg["users"], msg["data"])
+        elif op == "join":
+            for user_id in msg["users"]:
+                self.routes.add(node_id, user_id)
+            self._presence_changed(msg["users"])
+        elif op == "leave":
+            self.routes.remove(node_id, msg["user"])
+            self._clear_away(msg["user"], node_id)
+            self._presence_changed([msg["user"]])
+        elif op == "away":
+            if msg["away"]:
+                self._away.setdefault(msg["user"], set()).add(node_id)
+            else:
+                self._clear_away(msg["user"], node_id)
+            self._presence_changed([msg["user"]])
+        elif op == "hello":
+            # A node just started: tell it who we hold so it can route to us
+            await self._announce(lambda reply: self._send(node_id, reply))
+        elif op == "bye":
+            self._drop_node(node_id)
+
+    async def _announce(self, send: Callable[[dict], Awaitable[None]]):
+        """Pass this node's users and away flags to ``send``, chunked."""
+        users = list(self._local_users)
+        for i in range(0, len(users), _JOIN_CHUNK):
+            await send({"op": "join", "node": self.node_id, "users": users[i : i + _JOIN_CHUNK]})
+        for user_id, nodes in list(self._away.items()):
+            if self.node_id in nodes:
+                await send({"op": "away", "node": self.node_id, "user": user_id, "away": True})
+
+    async def _resync(self):
+        """Rebuild routes after the transport came back.
+
+        Joins and leaves sent while disconnected are lost, so forget every
+        peer and have them announce themselves again; they may have timed
+        this node out as well, so re-announce its users to everyone.
+        """
+        for node_id in set(self.routes.nodes()) | set(self._last_seen):
+            self._drop_node(node_id)
+        await self._broadcast({"op": "hello", "node": self.node_id})
+        await self._announce(self._broadcast)
+
+    async def _heartbeat_loop(self):
+        interval = settings.BACKPLANE_HEARTBEAT_SECONDS
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self._broadcast({"op": "ping", "node": self.node_id})
+                await self._maintain()
+            except Exception:
+                logger.exception("backplane: heartbeat failed")
+            # Nodes that crashed never say bye; forget their routes
+            cutoff = time.monotonic() - 3 * interval
+            for node_id, seen in list(self._last_seen.items()):
+                if seen < cutoff:
+                    logger.warning("backplane: node %s timed out", node_id)
+                    self._drop_node(node_id)
+
+    def _drop_node(self, node_id: str):
+        users = self.routes.users_for(node_id)
+        self.routes.drop_node(node_id)
+        self._last_seen.pop(node_id, None)
+        for user_id in users:
+            self._clear_away(user_id, node_id)
+        self._presence_changed(users)
+
+    def _clear_away(self, user_id: str, node_id: str):
+        nodes = self._away.get(user_id)
+        if nodes is not None:
+            nodes.discard(node_id)
+            if not nodes:
+                del self._away[user_id]
+
+    def _presence_changed(self, user_ids: list[str]):
+        if self.on_presence is not None and user_ids:
+            self.on_presence(user_ids)
+
+    async def _maintain(self):
+        """Periodic transport housekeeping, run with each heartbeat."""
+
+    def _spawn(self, coro):
+        if not self._running:
+            coro.close()
+            return
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _open(self):
+        raise NotImplementedError
+
+    async def _close(self):
+        raise NotImplementedError
+
+    async def _broadcast(self, msg: dict):
+        raise NotImplementedError
+
+    async def _send(self, node_id: str, msg: dict):
+        raise NotImplementedError
+
+
+class InMemoryHub:
+    """Stand-in for a shared broker: connects backplanes living in one process."""
+
+    def __init__(self):
+        self.nodes: dict[str, "InMemoryBackplane"] = {}
+
+
+class InMemoryBackplane(Backplane):
+    def __init__(self, hub: InMemoryHub | None = None, node_id: str | None = None):
+        super().__init__(node_id)
+        self.hub = hub or InMemoryHub()
+
+    async def _open(self):
+        self.hub.nodes[self.node_id] = self
+
+    async def _close(self):
+        self.hub.nodes.pop(self.node_id, None)
+
+    async def _broadcast(self, msg: dict):
+        for node in list(self.hub.nodes.values()):
+            if node is not self:
+                await node._handle(msg)
+
+    async def _send(self, node_id: str, msg: dict):
+        node = self.hub.nodes.get(node_id)
+        if node is not None:
+            await node._handle(msg)
+
+
+class PostgresBackplane(Backplane):
+    """Backplane over Postgres LISTEN/NOTIFY.
+
+    Control messages go to a shared channel; deliveries go to a per-node
+    channel so only the nodes that hold a recipient wake up. A message too
+    large for NOTIFY is stored in ``backplane_payloads`` and sent as a
+    reference that the receivers fetch. If either connection is lost, both
+    are reopened with backoff and the node resyncs its routes.
+    """
+
+    CONTROL_CHANNEL = "chat_control"
+
+    def __init__(self, dsn: str, node_id: str | None = None):
+        super().__init__(node_id)
+        self._dsn = dsn
+        self._listen_conn = None
+        self._notify_conn = None
+        self._notify_lock = asyncio.Lock()
+        self._reconnecting: asyncio.Task | None = None
+
+    @staticmethod
+    def node_channel(node_id: str) -> str:
+        return "chat_node_" + hashlib.sha1(node_id.encode()).hexdigest()[:20]
+
+    async def _open(self):
+        import asyncpg
+
+        self._listen_conn = await asyncpg.connect(self._dsn)
+        self._notify_conn = await asyncpg.connect(self._dsn)
+        for conn in (self._listen_conn, self._notify_conn):
+            conn.add_termination_listener(self._on_terminated)
+        await self._listen_conn.add_listener(self.CONTROL_CHANNEL, self._on_notify)
+        await self._listen_conn.add_listener(self.node_channel(self.node_id), self._on_notify)
+
+    async def _close(self):
+        if self._reconnecting is not None:
+            self._reconnecting.cancel()
+            self._reconnecting = None
+        conns = (self._listen_conn, self._notify_conn)
+        self._listen_conn = self._notify_conn = None
+        for conn in conns:
+            if conn is not None:
+                try:
+                    await conn.close(timeout=5)
+                except Exception:
+                    conn.terminate()
+
+    def _on_terminated(self, connection):
+        if connection in (self._listen_conn, self._notify_conn):
+            self._start_reconnect()
+
+    def _start_reconnect(self):
+        if self._running and self._reconnecting is None:
+            logger.warning("backplane: lost connection to Postgres, reconnecting")
+            self._reconnecting = asyncio.create_task(self._reconnect())
+
+    async def _reconnect(self):
+        delay = 0.5
+        try:
+            while self._running:
+                for conn in (self._listen_conn, self._notify_conn):
+                    if conn is not None:
+                        conn.terminate()
+                self._listen_conn = self._notify_conn = None
+                try:
+                    await self._open()
+                    await self._resync()
+                except Exception:
+                    logger.exception("backplane: reconnect failed, retrying in %.1fs", delay)
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, 30.0)
+                    continue
+                logger.info("backplane: reconnected")
+                return
+        finally:
+            self._reconnecting = None
+
+    def _on_notify(self, connection, pid, channel, payload):
+        self._spawn(self._receive(payload))
+
+    def _connection(self):
+        if self._notify_conn is None or self._notify_conn.is_closed():
+            self._start_reconnect()
+            raise ConnectionError("backplane: not connected to Postgres")
+        return self._notify_conn
+
+    async def _receive(self, payload: str):
+        msg = json.loads(payload)
+        if msg.get("op") == "ref":
+            async with self._notify_lock:
+                payload = await self._connection().fetchval(
+                    "SELECT payload FROM backplane_payloads WHERE id = $1", uuid.UUID(msg["ref"])
+                )
+            if payload is None:
+                logger.warning("backplane: payload %s from node %s expired", msg["ref"], msg.get("node"))
+                return
+            msg = json.loads(payload)
+        await self._handle(msg)
+
+    async def _notify(self, channel: str, msg: dict):
+        payload = json.dumps(msg, separators=(",", ":"), ensure_ascii=False)
+        async with self._notify_lock:
+            conn = self._connection()
+            if len(payload.encode()) > _NOTIFY_MAX_BYTES:
+                # The insert commits before the NOTIFY is sent, so receivers find the row
+                ref = uuid.uuid4()
+                await conn.execute("INSERT INTO backplane_payloads (id, payload) VALUES ($1, $2)", ref, payload)
+                payload = json.dumps({"op": "ref", "node": self.node_id, "ref": str(ref)})
+            await conn.execute("SELECT pg_notify($1, $2)", channel, payload)
+
+    async def _maintain(self):
+        # A LISTEN connection killed while idle may only show up here
+        if self._listen_conn is None or self._listen_conn.is_closed():
+            self._start_reconnect()
+        async with self._notify_lock:
+            # Receivers fetch within milliseconds; a minute covers slow ones
+            await self._connection().execute(
+                "DELETE FROM backplane_payloads WHERE created_at < now() - interval '1 minute'"
+            )
+
+    async def _broadcast(self, msg: dict):
+        await self._notify(self.CONTROL_CHANNEL, msg)
+
+    async def _send(self, node_id: str, msg: dict):
+        await self._notify(self.node_channel(node_id), msg)
+
+
+def create_backplane() -> Backplane:
+    if settings.BACKPLANE == "postgres":
+        url = make_url(settings.DATABASE_URL).set(drivername="postgresql")
+        return PostgresBackplane(url.render_as_string(hide_password=False))
+    if settings.BACKPLANE == "memory":
+        return InMemoryBackplane()
+    raise ValueError(f"Unknown BACKPLANE: {settings.BACKPLANE!r}")
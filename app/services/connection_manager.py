@@ -1,34 +1,273 @@
+import asyncio
+import logging
+import time
 import uuid
-from collections import defaultdict
+from collections import deque
 
-from fastapi import WebSocket
+from fastapi import WebSocket, WebSocketDisconnect
+
+from app.core.config import settings
+from app.core.metrics import registry
+from app.core.wire import MSGPACK_SUBPROTOCOL, Frame, decode_frame, negotiate
+from app.services.backplane import Backplane, create_backplane
+
+logger = logging.getLogger(__name__)
+
+# "Try again later": closes a consumer that cannot keep up with its queue
+SLOW_CONSUMER_CLOSE_CODE = 1013
+# Nothing received for WS_IDLE_TIMEOUT_SECONDS, not even a pong
+IDLE_CLOSE_CODE = 4002
+# Policy violation: the user already has WS_MAX_CONNECTIONS_PER_USER sockets
+TOO_MANY_CONNECTIONS_CLOSE_CODE = 1008
+# Unexpected server-side error while handling the socket
+INTERNAL_ERROR_CLOSE_CODE = 1011
+
+PING = Frame({"type": "ping"})
+
+WS_SEND_SECONDS = registry.histogram("chatapp_ws_send_seconds", "Time to write one frame to a socket")
+
+
+class _Connection:
+    """A socket plus the bounded outbound queue drained by its writer task."""
+
+    __slots__ = (
+        "user_id",
+        "websocket",
+        "subprotocol",
+        "queue",
+        "ready",
+        "writer",
+        "away",
+        "connected_at",
+        "last_seen",
+        "bytes_sent",
+    )
+
+    def __init__(self, user_id: str, websocket: WebSocket, subprotocol: str | None):
+        self.user_id = user_id
+        self.websocket = websocket
+        self.subprotocol = subprotocol
+        self.queue: deque[Frame] = deque()
+        self.ready = asyncio.Event()
+        self.writer: asyncio.Task | None = None
+        self.away = False
+        self.connected_at = time.time()
+        # Monotonic time of the last frame received from the client
+        self.last_seen = time.monotonic()
+        self.bytes_sent = 0
 
 
 class ConnectionManager:
-    def __init__(self):
-        # Maps user_id -> list of active WebSocket connections
-        self._connections: dict[str, list[WebSocket]] = defaultdict(list)
+    def __init__(self, backplane: Backplane | None = None):
+        # Maps user_id -> active connections on this node; users without
+        # sockets have no entry
+        self._connections: dict[str, list[_Connection]] = {}
+        # user_id -> handshakes in progress, counted against the per-user cap
+        self._handshakes: dict[str, int] = {}
+        # Closes run in the background; keep references until they finish
+        self._closing: set[asyncio.Task] = set()
+        self.backplane = backplane or create_backplane()
+        self.queue_size = settings.WS_SEND_QUEUE_SIZE
+        self.overflow_policy = settings.WS_OVERFLOW_POLICY
+        self.max_per_user = settings.WS_MAX_CONNECTIONS_PER_USER
+        self.ping_interval = settings.WS_PING_INTERVAL_SECONDS
+        self.idle_timeout = settings.WS_IDLE_TIMEOUT_SECONDS
+        self._reaper: asyncio.Task | None = None
+        self.sent = 0
+        self.dropped = 0
+        self.slow_disconnects = 0
+        self.idle_disconnects = 0
+        self.rejected = 0
+
+    async def start(self):
+        await self.backplane.start(self._deliver_local)
+        self._reaper = asyncio.create_task(self._reap())
 
-    async def connect(self, user_id: uuid.UUID, websocket: WebSocket):
-        await websocket.accept()
-        self._connections[str(user_id)].append(websocket)
+    async def stop(self):
+        if self._reaper is not None:
+            self._reaper.cancel()
+            self._reaper = None
+        await self.backplane.stop()
 
-    def disconnect(self, user_id: uuid.UUID, websocket: WebSocket):
+    async def connect(self, user_id: uuid.UUID, websocket: WebSocket) -> _Connection | None:
+        """Accept the socket, or refuse it if the user is at the connection cap."""
         uid = str(user_id)
-        self._connections[uid].discard if False else None
-        if websocket in self._connections[uid]:
-            self._connections[uid].remove(websocket)
+        if len(self._connections.get(uid, ())) + self._handshakes.get(uid, 0) >= self.max_per_user:
+            self.rejected += 1
+            await websocket.close(code=TOO_MANY_CONNECTIONS_CLOSE_CODE)
+            return None
+        # Hold the slot across the accept, or concurrent handshakes could
+        # all pass the check above
+        self._handshakes[uid] = self._handshakes.get(uid, 0) + 1
+        try:
+            subprotocol = negotiate(websocket.scope.get("subprotocols", []))
+            await websocket.accept(subprotocol=subprotocol)
+        finally:
+            if self._handshakes[uid] == 1:
+                del self._handshakes[uid]
+            else:
+                self._handshakes[uid] -= 1
+        conn = _Connection(uid, websocket, subprotocol)
+        conn.writer = asyncio.create_task(self._writer(conn))
+        was_away = self._all_away(uid)
+        conns = self._connections.setdefault(uid, [])
+        conns.append(conn)
+        if len(conns) == 1:
+            self.backplane.join(uid)
+        elif was_away:
+            self.backplane.set_away(uid, False)
+        return conn
+
+    def disconnect(self, conn: _Connection):
+        """Forget ``conn``; safe to call more than once."""
+        self._remove(conn)
+
+    async def close(self, conn: _Connection, code: int):
+        self._remove(conn)
+        await self._close(conn.websocket, code)
+
+    def set_away(self, conn: _Connection, away: bool):
+        """Mark one socket idle or active; the user is away once all their sockets are."""
+        was_away = self._all_away(conn.user_id)
+        conn.away = away
+        if self._all_away(conn.user_id) != was_away:
+            self.backplane.set_away(conn.user_id, not was_away)
 
     async def send_to_user(self, user_id: uuid.UUID, data: dict):
-        uid = str(user_id)
-        dead = []
-        for ws in self._connections.get(uid, []):
+        await self.send_to_users([user_id], data)
+
+    async def send_to_users(self, user_ids: list[uuid.UUID], data: dict):
+        """Queue for local sockets and publish once to the nodes holding the rest."""
+        uids = list(dict.fromkeys(str(user_id) for user_id in user_ids))
+        self._enqueue_local(uids, Frame(data))
+        await self.backplane.publish(uids, data)
+
+    def reply(self, conn: _Connection, data: dict):
+        """Queue a frame for one socket only (errors, acks)."""
+        self._enqueue(conn, Frame(data))
+
+    @staticmethod
+    async def receive(conn: _Connection):
+        """Read and decode one frame in the connection's negotiated format.
+
+        Raises ValueError for a frame that can't be decoded, including a
+        text frame on a MessagePack socket and vice versa.
+        """
+        message = await conn.websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            raise WebSocketDisconnect(message["code"], message.get("reason"))
+        conn.last_seen = time.monotonic()
+        raw = message.get("bytes" if conn.subprotocol == MSGPACK_SUBPROTOCOL else "text")
+        if raw is None:
+            raise ValueError("unexpected frame kind")
+        return decode_frame(raw, conn.subprotocol)
+
+    def stats(self) -> dict:
+        depths = [len(conn.queue) for conns in self._connections.values() for conn in conns]
+        return {
+            "connections": len(depths),
+            "users": len(self._connections),
+            "queued": sum(depths),
+            "max_queue_depth": max(depths, default=0),
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "slow_disconnects": self.slow_disconnects,
+            "idle_disconnects": self.idle_disconnects,
+            "rejected": self.rejected,
+        }
+
+    def _all_away(self, uid: str) -> bool:
+        conns = self._connections.get(uid)
+        return bool(conns) and all(conn.away for conn in conns)
+
+    async def _deliver_local(self, user_ids: list[str], data: dict):
+        self._enqueue_local(user_ids, Frame(data))
+
+    def _enqueue_local(self, user_ids: list[str], frame: Frame):
+        # One Frame for every socket: each wire format is encoded at most once
+        for uid in user_ids:
+            for conn in list(self._connections.get(uid, ())):
+                self._enqueue(conn, frame)
+
+    def _enqueue(self, conn: _Connection, frame: Frame):
+        if len(conn.queue) >= self.queue_size:
+            if self.overflow_policy == "disconnect":
+                self.slow_disconnects += 1
+                self._remove(conn)
+                self._close_later(conn.websocket, SLOW_CONSUMER_CLOSE_CODE)
+                return
+            conn.queue.popleft()
+            self.dropped += 1
+        conn.queue.append(frame)
+        conn.ready.set()
+
+    async def _writer(self, conn: _Connection):
+        while True:
+            while not conn.queue:
+                conn.ready.clear()
+                await conn.ready.wait()
+            frame = conn.queue.popleft()
+            start = time.perf_counter()
             try:
-                await ws.send_json(data)
+                if conn.subprotocol == MSGPACK_SUBPROTOCOL:
+                    await conn.websocket.send_bytes(frame.packed)
+                    conn.bytes_sent += len(frame.packed)
+                else:
+                    await conn.websocket.send_text(frame.text)
+                    conn.bytes_sent += frame.text_size
             except Exception:
-                dead.append(ws)
-        for ws in dead:
-            self._connections[uid].remove(ws)
+                self._remove(conn)
+                return
+            WS_SEND_SECONDS.observe(time.perf_counter() - start)
+            self.sent += 1
+
+    async def _reap(self):
+        """Ping quiet sockets and close the ones that stopped answering."""
+        while True:
+            await asyncio.sleep(self.ping_interval)
+            try:
+                self._reap_once()
+            except Exception:
+                logger.exception("connection manager: reaper pass failed")
+
+    def _reap_once(self):
+        now = time.monotonic()
+        for conns in list(self._connections.values()):
+            for conn in list(conns):
+                idle = now - conn.last_seen
+                if idle >= self.idle_timeout:
+                    self.idle_disconnects += 1
+                    self._remove(conn)
+                    self._close_later(conn.websocket, IDLE_CLOSE_CODE)
+                elif idle >= self.ping_interval:
+                    self._enqueue(conn, PING)
+
+    def _remove(self, conn: _Connection):
+        conns = self._connections.get(conn.user_id)
+        if conns is None or conn not in conns:
+            return
+        was_away = self._all_away(conn.user_id)
+        conns.remove(conn)
+        if conn.writer is not None and conn.writer is not asyncio.current_task():
+            conn.writer.cancel()
+        conn.queue.clear()
+        if not conns:
+            del self._connections[conn.user_id]
+            self.backplane.leave(conn.user_id)
+        elif self._all_away(conn.user_id) != was_away:
+            self.backplane.set_away(conn.user_id, not was_away)
+
+    def _close_later(self, websocket: WebSocket, code: int):
+        task = asyncio.create_task(self._close(websocket, code))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    @staticmethod
+    async def _close(websocket: WebSocket, code: int):
+        try:
+            await websocket.close(code=code)
+        except Exception:
+            logger.debug("close of websocket failed", exc_info=True)
 
 
 manager = ConnectionManager()
@@ -0,0 +1,48 @@
+from sqlalchemy import case, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.conversation import Conversation, ordered_pair
+from app.models.message import DirectMessage
+
+
+async def record_messages(db: AsyncSession, messages: list[DirectMessage]):
+    """Fold flushed messages into their ``conversations`` rows.
+
+    Must run in the transaction that inserts the messages: ``now()`` is the
+    transaction timestamp, so ``last_at`` equals the messages' ``created_at``.
+    """
+    rows: dict[tuple, dict] = {}
+    for msg in messages:
+        a, b = ordered_pair(msg.sender_id, msg.recipient_id)
+        row = rows.setdefault(
+            (a, b),
+            {"user_a_id": a, "user_b_id": b, "unread_a": 0, "unread_b": 0, "last_at": func.now()},
+        )
+        row["last_message_id"] = msg.id
+        row["last_sender_id"] = msg.sender_id
+        if msg.sender_id != msg.recipient_id:
+            row["unread_a" if msg.recipient_id == a else "unread_b"] += 1
+    if not rows:
+        return
+
+    # Rows are locked in (user_a_id, user_b_id) order, the same order read
+    # receipts lock them in, so concurrent writers and flushes can't deadlock
+    stmt = insert(Conversation).values([rows[pair] for pair in sorted(rows)])
+    # A transaction that started earlier may commit later; never move last_* backwards
+    newer = stmt.excluded.last_at >= Conversation.last_at
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Conversation.user_a_id, Conversation.user_b_id],
+        set_={
+            "last_message_id": case(
+                (newer, stmt.excluded.last_message_id), else_=Conversation.last_message_id
+            ),
+            "last_sender_id": case(
+                (newer, stmt.excluded.last_sender_id), else_=Conversation.last_sender_id
+            ),
+            "last_at": func.greatest(Conversation.last_at, stmt.excluded.last_at),
+            "unread_a": Conversation.unread_a + stmt.excluded.unread_a,
+            "unread_b": Conversation.unread_b + stmt.excluded.unread_b,
+        },
+    )
+    await db.execute(stmt)
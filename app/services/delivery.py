@@ -0,0 +1,97 @@
+import uuid
+from collections import Counter
+
+from sqlalchemy import select, union_all
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.delivery_sequence import DeliverySequence
+from app.models.message import DirectMessage
+from app.models.user import User
+
+
+def message_payload(msg: DirectMessage, sender_username: str) -> dict:
+    return {
+        "id": str(msg.id),
+        "sender_id": str(msg.sender_id),
+        "sender_username": sender_username,
+        "recipient_id": str(msg.recipient_id),
+        "content": msg.content,
+        "created_at": msg.created_at.isoformat(),
+        "sender_seq": msg.sender_seq,
+        "recipient_seq": msg.recipient_seq,
+    }
+
+
+async def allocate_sequences(db: AsyncSession, messages: list[DirectMessage]):
+    """Give each message the next delivery sequence number of both its users.
+
+    The counter rows stay locked until the caller commits, so each user's
+    sequence numbers become visible in order.
+    """
+    counts: Counter[uuid.UUID] = Counter()
+    for msg in messages:
+        counts[msg.sender_id] += 1
+        if msg.recipient_id != msg.sender_id:
+            counts[msg.recipient_id] += 1
+
+    # Lock counter rows in a fixed order so concurrent batches can't deadlock
+    stmt = insert(DeliverySequence).values(
+        [{"user_id": user_id, "seq": counts[user_id]} for user_id in sorted(counts)]
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[DeliverySequence.user_id],
+        set_={"seq": DeliverySequence.seq + stmt.excluded.seq},
+    ).returning(DeliverySequence.user_id, DeliverySequence.seq)
+    result = await db.execute(stmt)
+    next_seq = {user_id: last - counts[user_id] + 1 for user_id, last in result.tuples()}
+
+    for msg in messages:
+        msg.sender_seq = next_seq[msg.sender_id]
+        next_seq[msg.sender_id] += 1
+        if msg.recipient_id == msg.sender_id:
+            msg.recipient_seq = msg.sender_seq
+        else:
+            msg.recipient_seq = next_seq[msg.recipient_id]
+            next_seq[msg.recipient_id] += 1
+
+
+async def missed_messages(
+    db: AsyncSession, user_id: uuid.UUID, after_seq: int, limit: int
+) -> list[tuple[int, dict]]:
+    """Messages in ``user_id``'s sequence after ``after_seq``, as (seq, payload) in order."""
+    columns = (
+        DirectMessage.id,
+        DirectMessage.sender_id,
+        DirectMessage.recipient_id,
+        DirectMessage.content,
+        DirectMessage.created_at,
+        DirectMessage.sender_seq,
+        DirectMessage.recipient_seq,
+    )
+    received = (
+        select(*columns, DirectMessage.recipient_seq.label("seq"))
+        .where(DirectMessage.recipient_id == user_id, DirectMessage.recipient_seq > after_seq)
+        .order_by(DirectMessage.recipient_seq)
+        .limit(limit)
+    )
+    # Sent from another device; messages to self are already in `received`
+    sent = (
+        select(*columns, DirectMessage.sender_seq.label("seq"))
+        .where(
+            DirectMessage.sender_id == user_id,
+            DirectMessage.sender_seq > after_seq,
+            DirectMessage.recipient_id != user_id,
+        )
+        .order_by(DirectMessage.sender_seq)
+        .limit(limit)
+    )
+    missed = union_all(received, sent).subquery()
+    stmt = (
+        select(missed, User.username)
+        .join(User, User.id == missed.c.sender_id)
+        .order_by(missed.c.seq)
+        .limit(limit)
+    )
+    rows = (await db.execute(stmt)).all()
+    return [(row.seq, message_payload(row, row.username)) for row in rows]
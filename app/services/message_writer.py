@@ -0,0 +1,275 @@
+import asyncio
+import logging
+import time
+import uuid
+from datetime import timedelta
+
+from fastapi import HTTPException
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.ids import uuid7
+from app.core.metrics import registry
+from app.db.session import AsyncSessionLocal
+from app.models.idempotency_key import MessageIdempotencyKey
+from app.models.message import DirectMessage
+from app.services.conversations import record_messages
+from app.services.delivery import allocate_sequences
+
+logger = logging.getLogger(__name__)
+
+# The maintainer deletes expired keys only every few hours; until then an
+# expired key is treated as free
+_KEY_TTL = timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS)
+
+MESSAGES_PERSISTED = registry.counter("chatapp_messages_persisted_total", "Direct messages committed")
+MESSAGE_FLUSH_SECONDS = registry.histogram(
+    "chatapp_message_flush_seconds", "Time to insert and commit one batch of messages"
+)
+MESSAGE_BATCH_MESSAGES = registry.histogram(
+    "chatapp_message_batch_messages",
+    "Messages per committed batch",
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500),
+)
+
+
+class _Pending:
+    __slots__ = ("message", "future")
+
+    def __init__(self, message: DirectMessage, future: asyncio.Future):
+        self.message = message
+        self.future = future
+
+
+class MessageWriter:
+    """Group-commits direct messages written by every connection on this worker.
+
+    Writes are collected for up to ``max_delay`` seconds (or until
+    ``batch_size`` are waiting), inserted with one multi-row
+    ``INSERT ... RETURNING`` and committed together; each caller's future
+    resolves only after that commit.
+    """
+
+    def __init__(self, batch_size: int = 100, max_delay: float = 0.005):
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self._pending: list[_Pending] = []
+        self._has_pending = asyncio.Event()
+        self._batch_full = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._closing = False
+        self.batches = 0
+        self.messages = 0
+        self.failures = 0
+
+    async def start(self):
+        self._closing = False
+        self._has_pending = asyncio.Event()
+        self._batch_full = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Flush whatever is pending, then stop accepting writes."""
+        if self._task is None:
+            return
+        self._closing = True
+        self._has_pending.set()
+        await self._task
+        self._task = None
+
+    async def write(self, sender_id: uuid.UUID, recipient_id: uuid.UUID, content: str) -> DirectMessage:
+        """Persist one message and return it once it is durable."""
+        if self._closing:
+            raise RuntimeError("message writer is shutting down")
+        msg = DirectMessage(
+            id=uuid7(), sender_id=sender_id, recipient_id=recipient_id, content=content
+        )
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append(_Pending(msg, future))
+        self._has_pending.set()
+        if len(self._pending) >= self.batch_size:
+            self._batch_full.set()
+        return await future
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self._pending),
+            "batches": self.batches,
+            "messages": self.messages,
+            "failures": self.failures,
+        }
+
+    async def _run(self):
+        while not (self._closing and not self._pending):
+            await self._has_pending.wait()
+            if not self._pending:
+                self._has_pending.clear()
+                continue
+            if len(self._pending) < self.batch_size and not self._closing:
+                try:
+                    await asyncio.wait_for(self._batch_full.wait(), self.max_delay)
+                except asyncio.TimeoutError:
+                    pass
+            batch = self._take()
+            try:
+                await self._flush(batch)
+            except Exception:
+                logger.exception("message writer: flush failed")
+
+    def _take(self) -> list[_Pending]:
+        batch = self._pending[: self.batch_size]
+        del self._pending[: self.batch_size]
+        if len(self._pending) < self.batch_size:
+            self._batch_full.clear()
+        if not self._pending:
+            self._has_pending.clear()
+        return batch
+
+    async def _flush(self, batch: list[_Pending]):
+        start = time.perf_counter()
+        try:
+            await self._insert([item.message for item in batch])
+        except IntegrityError as exc:
+            if len(batch) > 1:
+                # One bad row (e.g. an unknown recipient) must not fail the
+                # rest of the batch: retry each message on its own
+                for item in batch:
+                    await self._flush([item])
+                return
+            self._fail(batch, exc)
+            return
+        except Exception as exc:
+            # Pool timeouts, lost connections, the database being down:
+            # retrying row by row would only multiply the wait
+            self._fail(batch, exc)
+            return
+        MESSAGE_FLUSH_SECONDS.observe(time.perf_counter() - start)
+        MESSAGE_BATCH_MESSAGES.observe(len(batch))
+        MESSAGES_PERSISTED.inc(len(batch))
+        self.batches += 1
+        self.messages += len(batch)
+        for item in batch:
+            if not item.future.done():
+                item.future.set_result(item.message)
+
+    def _fail(self, batch: list[_Pending], exc: Exception):
+        self.failures += len(batch)
+        for item in batch:
+            if not item.future.done():
+                item.future.set_exception(exc)
+
+    @staticmethod
+    async def _insert(messages: list[DirectMessage]):
+        async with AsyncSessionLocal() as db:
+            await store_messages(db, messages)
+            await db.commit()
+
+
+async def store_messages(db: AsyncSession, messages: list[DirectMessage]):
+    """Insert ``messages`` with one multi-row statement; the caller commits.
+
+    Sets each message's sequences and ``created_at``.
+    """
+    if not messages:
+        return
+    await allocate_sequences(db, messages)
+    result = await db.execute(
+        insert(DirectMessage)
+        .values(
+            [
+                {
+                    "id": msg.id,
+                    "sender_id": msg.sender_id,
+                    "recipient_id": msg.recipient_id,
+                    "content": msg.content,
+                    "sender_seq": msg.sender_seq,
+                    "recipient_seq": msg.recipient_seq,
+                }
+                for msg in messages
+            ]
+        )
+        .returning(DirectMessage.id, DirectMessage.created_at)
+    )
+    created_at = dict(result.tuples().all())
+    await record_messages(db, messages)
+    for msg in messages:
+        msg.created_at = created_at[msg.id]
+
+
+async def write_batch(
+    db: AsyncSession, sender_id: uuid.UUID, items: list[tuple[uuid.UUID, str, str | None]]
+) -> list[tuple[DirectMessage, bool]]:
+    """Store ``(recipient_id, content, idempotency_key)`` items in one transaction.
+
+    A key the sender used within ``IDEMPOTENCY_KEY_TTL_HOURS`` returns the
+    message stored under it instead of a new one. Returns ``(message,
+    replayed)`` in request order; keys must be unique within ``items``.
+    Raises 422 if a key is reused for a different message, and 409 if the
+    message it refers to was archived.
+    """
+    messages = [
+        DirectMessage(id=uuid7(), sender_id=sender_id, recipient_id=recipient_id, content=content)
+        for recipient_id, content, _ in items
+    ]
+    keyed = {key: msg for (_, _, key), msg in zip(items, messages) if key is not None}
+    replayed: dict[str, DirectMessage] = {}
+    if keyed:
+        # Claiming a key blocks on a concurrent request holding it until that
+        # one commits or rolls back, so a key maps to exactly one message.
+        # Claim in key order so two overlapping batches can't deadlock
+        claim = insert(MessageIdempotencyKey).values(
+            [{"sender_id": sender_id, "key": key, "message_id": msg.id} for key, msg in sorted(keyed.items())]
+        )
+        claim = claim.on_conflict_do_update(
+            index_elements=[MessageIdempotencyKey.sender_id, MessageIdempotencyKey.key],
+            set_={"message_id": claim.excluded.message_id, "created_at": func.now()},
+            where=MessageIdempotencyKey.created_at <= func.now() - _KEY_TTL,
+        ).returning(MessageIdempotencyKey.key)
+        claimed = set((await db.execute(claim)).scalars())
+        if len(claimed) < len(keyed):
+            rows = await db.execute(
+                select(MessageIdempotencyKey.key, DirectMessage)
+                .select_from(MessageIdempotencyKey)
+                .outerjoin(
+                    DirectMessage,
+                    (DirectMessage.id == MessageIdempotencyKey.message_id)
+                    & (DirectMessage.created_at == MessageIdempotencyKey.created_at),
+                )
+                .where(
+                    MessageIdempotencyKey.sender_id == sender_id,
+                    MessageIdempotencyKey.key.in_(keyed.keys() - claimed),
+                )
+            )
+            replayed = dict(rows.tuples().all())
+            for key in keyed.keys() - claimed:
+                stored, requested = replayed.get(key), keyed[key]
+                if stored is None:
+                    # Its partition was archived; storing the message again
+                    # would deliver a duplicate the key was meant to prevent
+                    raise HTTPException(
+                        status_code=409, detail=f"Idempotency key {key!r} refers to a message no longer stored"
+                    )
+                if (stored.recipient_id, stored.content) != (requested.recipient_id, requested.content):
+                    raise HTTPException(
+                        status_code=422, detail=f"Idempotency key {key!r} was already used for a different message"
+                    )
+
+    results = []
+    for (_, _, key), msg in zip(items, messages):
+        if key is not None and key in replayed:
+            results.append((replayed[key], True))
+        else:
+            results.append((msg, False))
+    await store_messages(db, [msg for msg, was_replayed in results if not was_replayed])
+    await db.commit()
+    MESSAGES_PERSISTED.inc(sum(1 for _, was_replayed in results if not was_replayed))
+    return results
+
+
+message_writer = MessageWriter(
+    batch_size=settings.MESSAGE_BATCH_SIZE,
+    max_delay=settings.MESSAGE_BATCH_DELAY_MS / 1000,
+)
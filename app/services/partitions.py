@@ -0,0 +1,64 @@
+import asyncio
+import logging
+from datetime import timedelta
+
+from sqlalchemy import delete, func, text
+
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.models.idempotency_key import MessageIdempotencyKey
+
+logger = logging.getLogger(__name__)
+
+
+class PartitionMaintainer:
+    """Keeps future monthly partitions of direct_messages created.
+
+    There is no default partition (it can't be pruned), so an insert into a
+    month that doesn't exist yet fails; the next months are created well
+    ahead of time. The
+    same pass deletes message idempotency keys older than ``key_ttl``.
+    """
+
+    def __init__(self, months_ahead: int, interval: float, key_ttl: timedelta):
+        self.months_ahead = months_ahead
+        self.interval = interval
+        self.key_ttl = key_ttl
+        self._task: asyncio.Task | None = None
+
+    async def start(self):
+        await self.ensure()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def ensure(self):
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(
+                    text("SELECT direct_messages_ensure_partitions(:months)"),
+                    {"months": self.months_ahead},
+                )
+                await db.execute(
+                    delete(MessageIdempotencyKey).where(
+                        MessageIdempotencyKey.created_at < func.now() - self.key_ttl
+                    )
+                )
+                await db.commit()
+        except Exception:
+            logger.exception("partitions: failed to create upcoming partitions")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.ensure()
+
+
+partition_maintainer = PartitionMaintainer(
+    months_ahead=settings.MESSAGE_PARTITION_MONTHS_AHEAD,
+    interval=settings.MESSAGE_PARTITION_CHECK_HOURS * 3600,
+    key_ttl=timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS),
+)
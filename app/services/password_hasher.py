@@ -0,0 +1,93 @@
+import asyncio
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+from app.core.config import settings
+from app.core.metrics import registry
+from app.core.security import hash_password, verify_password
+
+PASSWORD_WORK_SECONDS = registry.histogram(
+    "chatapp_password_hash_seconds", "Time spent in bcrypt", ("op",)
+)
+PASSWORD_QUEUE_SECONDS = registry.histogram(
+    "chatapp_password_queue_seconds", "Time bcrypt calls waited for a worker", ("op",)
+)
+
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+class PasswordHasher:
+    """Runs bcrypt on a bounded executor so it never blocks the event loop."""
+
+    def __init__(self, kind: str = "thread", workers: int = 4, max_concurrency: int = 8):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown PASSWORD_HASH_EXECUTOR: {kind!r}")
+        self.kind = kind
+        self.workers = workers
+        self._executor: Executor | None = None
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.waiting = 0
+        self.calls = 0
+        self.queue_seconds = 0.0
+        self.max_queue_seconds = 0.0
+        self.work_seconds = 0.0
+
+    async def hash(self, password: str) -> str:
+        return await self._run("hash", hash_password, password)
+
+    async def verify(self, plain: str, hashed: str) -> bool:
+        return await self._run("verify", verify_password, plain, hashed)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "waiting": self.waiting,
+            "queue_seconds_total": self.queue_seconds,
+            "queue_seconds_max": self.max_queue_seconds,
+            "work_seconds_total": self.work_seconds,
+        }
+
+    async def _run(self, op: str, fn, *args):
+        submitted = time.perf_counter()
+        self.waiting += 1
+        try:
+            async with self._semaphore:
+                loop = asyncio.get_running_loop()
+                result, work = await loop.run_in_executor(self._get_executor(), _timed, fn, *args)
+        finally:
+            self.waiting -= 1
+        # Everything that wasn't bcrypt itself was spent queued
+        queued = time.perf_counter() - submitted - work
+        self.calls += 1
+        self.work_seconds += work
+        self.queue_seconds += queued
+        self.max_queue_seconds = max(self.max_queue_seconds, queued)
+        PASSWORD_WORK_SECONDS.observe(work, op=op)
+        PASSWORD_QUEUE_SECONDS.observe(queued, op=op)
+        return result
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="password-hash"
+                )
+        return self._executor
+
+
+password_hasher = PasswordHasher(
+    kind=settings.PASSWORD_HASH_EXECUTOR,
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_concurrency=settings.PASSWORD_HASH_MAX_CONCURRENCY,
+)
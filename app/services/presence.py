@@ -0,0 +1,100 @@
+import asyncio
+import uuid
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.services.connection_manager import ConnectionManager, _Connection, manager
+
+
+class PresenceService:
+    """Presence and typing indicators, kept entirely in memory.
+
+    Status comes from the backplane's view of which nodes hold sockets for a
+    user. Sockets watching a user are told about changes at most once per
+    ``debounce`` seconds, and only if the status differs from what that
+    socket was last told, so reconnects and quick away/back flips produce no
+    frames.
+    """
+
+    def __init__(self, manager: ConnectionManager, debounce: float, max_watch: int, typing_window: float):
+        self.manager = manager
+        self.debounce = debounce
+        self.max_watch = max_watch
+        self._watchers: dict[str, set[_Connection]] = {}
+        # conn -> {watched user: status last sent to that conn}
+        self._watching: dict[_Connection, dict[str, str]] = {}
+        self._dirty: set[str] = set()
+        self._flush_handle: asyncio.TimerHandle | None = None
+        # (sender, recipient) pairs whose "typing" went out within the window
+        self._typing = TTLCache(maxsize=100_000, ttl=typing_window)
+        manager.backplane.on_presence = self.changed
+
+    def status(self, user_id: uuid.UUID | str) -> str:
+        return self.manager.backplane.status(str(user_id))
+
+    def statuses(self, user_ids) -> dict[str, str]:
+        return {str(user_id): self.status(user_id) for user_id in user_ids}
+
+    def watch(self, conn: _Connection, user_ids: list[str]) -> dict[str, str]:
+        """Replace the set of users ``conn`` gets presence updates for."""
+        self.unwatch(conn)
+        current = self.statuses(dict.fromkeys(user_ids[: self.max_watch]))
+        self._watching[conn] = dict(current)
+        for uid in current:
+            self._watchers.setdefault(uid, set()).add(conn)
+        return current
+
+    def unwatch(self, conn: _Connection):
+        for uid in self._watching.pop(conn, ()):
+            watchers = self._watchers.get(uid)
+            if watchers is not None:
+                watchers.discard(conn)
+                if not watchers:
+                    del self._watchers[uid]
+
+    def changed(self, user_ids: list[str]):
+        """Backplane callback; only users someone here watches are looked at again."""
+        self._dirty.update(uid for uid in user_ids if uid in self._watchers)
+        if self._dirty and self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(self.debounce, self._flush)
+
+    async def typing(self, sender_id: uuid.UUID, recipient_id: uuid.UUID, typing: bool):
+        """Forward a typing indicator, at most one "typing" per pair per window."""
+        key = (sender_id, recipient_id)
+        if typing:
+            if key in self._typing:
+                return
+            self._typing.set(key, True)
+        elif self._typing.pop(key) is None:
+            return
+        await self.manager.send_to_users(
+            [recipient_id], {"type": "typing", "user_id": str(sender_id), "typing": typing}
+        )
+
+    def stats(self) -> dict:
+        return {"watched_users": len(self._watchers), "watching_sockets": len(self._watching)}
+
+    def _flush(self):
+        self._flush_handle = None
+        updates: dict[_Connection, dict[str, str]] = {}
+        for uid in self._dirty:
+            watchers = self._watchers.get(uid)
+            if not watchers:
+                continue
+            status = self.status(uid)
+            for conn in watchers:
+                sent = self._watching[conn]
+                if sent.get(uid) != status:
+                    sent[uid] = status
+                    updates.setdefault(conn, {})[uid] = status
+        self._dirty.clear()
+        for conn, statuses in updates.items():
+            self.manager.reply(conn, {"type": "presence", "statuses": statuses})
+
+
+presence = PresenceService(
+    manager,
+    debounce=settings.PRESENCE_DEBOUNCE_SECONDS,
+    max_watch=settings.PRESENCE_MAX_WATCH,
+    typing_window=settings.TYPING_COALESCE_SECONDS,
+)
@@ -0,0 +1,135 @@
+import logging
+import time
+from collections import OrderedDict
+
+from app.core.config import settings
+from app.core.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMITED = registry.counter(
+    "chatapp_rate_limited_total", "Requests and frames rejected by a rate limit", ("scope",)
+)
+
+
+class TokenBucket:
+    """Holds up to ``burst`` tokens, refilled at ``rate`` per second."""
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """Spend one token; return 0 on success or the seconds until one is available."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """Token buckets per key, kept in this worker's memory.
+
+    Buckets are evicted least-recently-used beyond ``max_keys``; an evicted
+    key simply starts again with a full bucket.
+    """
+
+    backend = "memory"
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._buckets: OrderedDict[str, TokenBucket] = OrderedDict()
+        self.limited = 0
+
+    async def hit(self, scope: str, key: str, rate: float, burst: int) -> float:
+        """Count one event for ``key``; return 0 if allowed, else the seconds to wait."""
+        retry_after = await self._take(f"{scope}:{key}", rate, burst)
+        if retry_after:
+            self.limited += 1
+            RATE_LIMITED.inc(scope=scope)
+        return retry_after
+
+    async def close(self):
+        pass
+
+    def stats(self) -> dict:
+        return {"backend": self.backend, "keys": len(self._buckets), "limited": self.limited}
+
+    async def _take(self, key: str, rate: float, burst: int) -> float:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(rate, burst)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket.take()
+
+
+class RedisRateLimiter(RateLimiter):
+    """Token buckets shared by every worker through Redis.
+
+    Each check is one script call that refills and spends atomically using
+    the Redis clock. If Redis is unreachable requests are let through rather
+    than failing the whole API.
+    """
+
+    backend = "redis"
+
+    SCRIPT = """
+    local rate = tonumber(ARGV[1])
+    local burst = tonumber(ARGV[2])
+    local now = redis.call('TIME')
+    now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+    local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+    local tokens = tonumber(state[1]) or burst
+    local updated = tonumber(state[2]) or now
+    tokens = math.min(burst, tokens + (now - updated) * rate)
+    local retry_after = 0
+    if tokens >= 1 then
+        tokens = tokens - 1
+    else
+        retry_after = (1 - tokens) / rate
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+    redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000))
+    return tostring(retry_after)
+    """
+
+    def __init__(self, url: str):
+        super().__init__()
+        import redis.asyncio
+
+        self._redis = redis.asyncio.from_url(url)
+        self._script = self._redis.register_script(self.SCRIPT)
+
+    async def close(self):
+        await self._redis.aclose()
+
+    def stats(self) -> dict:
+        return {"backend": self.backend, "limited": self.limited}
+
+    async def _take(self, key: str, rate: float, burst: int) -> float:
+        try:
+            return float(await self._script(keys=[f"ratelimit:{key}"], args=[rate, burst]))
+        except Exception:
+            logger.exception("rate limiter: redis check failed, allowing")
+            return 0.0
+
+
+def create_rate_limiter() -> RateLimiter:
+    if settings.RATE_LIMIT_BACKEND == "redis":
+        return RedisRateLimiter(settings.RATE_LIMIT_REDIS_URL)
+    if settings.RATE_LIMIT_BACKEND == "memory":
+        return RateLimiter(settings.RATE_LIMIT_MAX_KEYS)
+    raise ValueError(f"Unknown RATE_LIMIT_BACKEND: {settings.RATE_LIMIT_BACKEND!r}")
+
+
+rate_limiter = create_rate_limiter()
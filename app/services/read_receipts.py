@@ -0,0 +1,230 @@
+import asyncio
+import logging
+import uuid
+from datetime import datetime
+
+from sqlalchemy import BigInteger, DateTime, column, func, or_, select, tuple_, update, values
+from sqlalchemy.dialects.postgresql import UUID
+
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.models.conversation import Conversation, ordered_pair
+from app.models.message import DirectMessage, conversation_key
+from app.models.room import Room, RoomMember
+from app.services.connection_manager import ConnectionManager, manager
+
+logger = logging.getLogger(__name__)
+
+
+class ReadReceipts:
+    """Coalesces read cursors in memory and writes them in batches.
+
+    Only the newest cursor per (reader, conversation) survives until the next
+    flush, so scrolling through a long history costs one row, and each flush
+    is one ``UPDATE ... FROM (VALUES ...)`` per table. Cursors only move
+    forward, which makes flushes from different workers commute.
+    """
+
+    def __init__(self, manager: ConnectionManager, interval: float, max_pending: int):
+        self.manager = manager
+        self.interval = interval
+        self.max_pending = max_pending
+        # (reader_id, partner_id) -> created_at of the newest message read
+        self._direct: dict[tuple[uuid.UUID, uuid.UUID], datetime] = {}
+        # (reader_id, room_id) -> seq of the newest message read
+        self._rooms: dict[tuple[uuid.UUID, uuid.UUID], int] = {}
+        self._full = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self.received = 0
+        self.flushes = 0
+        self.rows = 0
+        self.failures = 0
+
+    async def start(self):
+        self._full = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flush loop and write whatever is still buffered."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+    def mark_direct(self, reader_id: uuid.UUID, partner_id: uuid.UUID, read_at: datetime):
+        if reader_id == partner_id:
+            return
+        self.received += 1
+        self._merge(self._direct, (reader_id, partner_id), read_at)
+
+    def mark_room(self, reader_id: uuid.UUID, room_id: uuid.UUID, seq: int):
+        self.received += 1
+        self._merge(self._rooms, (reader_id, room_id), seq)
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self._direct) + len(self._rooms),
+            "received": self.received,
+            "flushes": self.flushes,
+            "rows": self.rows,
+            "failures": self.failures,
+        }
+
+    def _merge(self, pending: dict, key: tuple, cursor):
+        current = pending.get(key)
+        if current is None or cursor > current:
+            pending[key] = cursor
+        if len(self._direct) + len(self._rooms) >= self.max_pending:
+            self._full.set()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._full.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._full.clear()
+            await self.flush()
+
+    async def flush(self):
+        direct, self._direct = self._direct, {}
+        rooms, self._rooms = self._rooms, {}
+        if not direct and not rooms:
+            return
+        moved_direct: list[tuple] = []
+        moved_rooms: list[tuple] = []
+        try:
+            async with AsyncSessionLocal() as db:
+                if direct:
+                    # Lock first, in key order like record_messages, so a
+                    # flush and a message write can't deadlock. The recount
+                    # then runs as its own statement with a fresh snapshot:
+                    # a message committed while we waited for the lock is
+                    # counted instead of overwriting the writer's increment.
+                    await db.execute(_direct_lock(direct))
+                    for side, stmt in _direct_updates(direct):
+                        for a, b, read_at in (await db.execute(stmt)).tuples():
+                            moved_direct.append((a, b, read_at) if side == "a" else (b, a, read_at))
+                if rooms:
+                    moved_rooms = (await db.execute(_room_update(rooms))).tuples().all()
+                await db.commit()
+        except Exception:
+            self.failures += 1
+            logger.exception("read receipts: flush failed")
+            # Keep the cursors for the next attempt, unless newer ones arrived meanwhile
+            for key, read_at in direct.items():
+                self._merge(self._direct, key, read_at)
+            for key, seq in rooms.items():
+                self._merge(self._rooms, key, seq)
+            return
+        self.flushes += 1
+        self.rows += len(moved_direct) + len(moved_rooms)
+
+        # Receipts go out after the commit, only for cursors that moved and
+        # with the stored (clamped) value
+        for reader_id, partner_id, read_at in moved_direct:
+            await self.manager.send_to_users(
+                [partner_id, reader_id],
+                {
+                    "type": "read",
+                    "reader_id": str(reader_id),
+                    "user_id": str(partner_id),
+                    "last_read_at": read_at.isoformat(),
+                },
+            )
+        for reader_id, room_id, seq in moved_rooms:
+            # Only the reader's own sockets: a room-wide receipt would be a fan-out per read
+            await self.manager.send_to_user(
+                reader_id, {"type": "read", "reader_id": str(reader_id), "room_id": str(room_id), "seq": seq}
+            )
+
+
+def _direct_lock(cursors: dict[tuple[uuid.UUID, uuid.UUID], datetime]):
+    pairs = sorted({ordered_pair(reader_id, partner_id) for reader_id, partner_id in cursors})
+    return (
+        select(Conversation.user_a_id, Conversation.user_b_id)
+        .where(tuple_(Conversation.user_a_id, Conversation.user_b_id).in_(pairs))
+        .order_by(Conversation.user_a_id, Conversation.user_b_id)
+        .with_for_update()
+    )
+
+
+def _direct_updates(cursors: dict[tuple[uuid.UUID, uuid.UUID], datetime]) -> list[tuple[str, object]]:
+    """One ``(side, UPDATE)`` per side of the ordered pair the readers sit on.
+
+    Only rows whose cursor moves are updated; each returns (user_a_id,
+    user_b_id, new cursor).
+    """
+    sides: dict[str, list[tuple]] = {"a": [], "b": []}
+    for (reader_id, partner_id), read_at in cursors.items():
+        a, b = ordered_pair(reader_id, partner_id)
+        sides["a" if reader_id == a else "b"].append((a, b, conversation_key(a, b), read_at))
+
+    stmts = []
+    for side, rows in sides.items():
+        if not rows:
+            continue
+        v = values(
+            column("a", UUID(as_uuid=True)),
+            column("b", UUID(as_uuid=True)),
+            column("key", UUID(as_uuid=True)),
+            column("read_at", DateTime(timezone=True)),
+            name="v",
+        ).data(rows)
+        reader = Conversation.user_a_id if side == "a" else Conversation.user_b_id
+        last_read = getattr(Conversation, f"last_read_{side}_at")
+        # Never past the newest message, never backwards (see the WHERE below)
+        target = func.least(v.c.read_at, Conversation.last_at)
+        # Unread is recounted from the tail after the cursor, which the
+        # (conversation_key, created_at) index reaches directly; it is usually empty
+        unread = (
+            select(func.count())
+            .where(
+                DirectMessage.conversation_key == v.c.key,
+                DirectMessage.recipient_id == reader,
+                DirectMessage.created_at > target,
+            )
+            .scalar_subquery()
+        )
+        stmts.append(
+            (
+                side,
+                update(Conversation)
+                .where(
+                    Conversation.user_a_id == v.c.a,
+                    Conversation.user_b_id == v.c.b,
+                    or_(last_read.is_(None), last_read < target),
+                )
+                .values({last_read: target, f"unread_{side}": unread})
+                .returning(Conversation.user_a_id, Conversation.user_b_id, last_read),
+            )
+        )
+    return stmts
+
+
+def _room_update(cursors: dict[tuple[uuid.UUID, uuid.UUID], int]):
+    v = values(
+        column("user_id", UUID(as_uuid=True)),
+        column("room_id", UUID(as_uuid=True)),
+        column("seq", BigInteger),
+        name="v",
+    ).data([(reader_id, room_id, seq) for (reader_id, room_id), seq in cursors.items()])
+    room_last_seq = select(Room.last_seq).where(Room.id == RoomMember.room_id).scalar_subquery()
+    target = func.least(v.c.seq, room_last_seq)
+    return (
+        update(RoomMember)
+        .where(
+            RoomMember.user_id == v.c.user_id,
+            RoomMember.room_id == v.c.room_id,
+            RoomMember.last_read_seq < target,
+        )
+        .values(last_read_seq=target)
+        .returning(RoomMember.user_id, RoomMember.room_id, RoomMember.last_read_seq)
+    )
+
+
+read_receipts = ReadReceipts(
+    manager,
+    interval=settings.READ_FLUSH_INTERVAL_SECONDS,
+    max_pending=settings.READ_FLUSH_MAX_PENDING,
+)
@@ -0,0 +1,84 @@
+import uuid
+
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.ids import uuid7
+from app.models.room import Room, RoomMember, RoomMessage
+
+
+class RoomMembers:
+    """TTL+LRU cache of each room's member ids, used to authorize and fan out.
+
+    Membership changes made through this worker invalidate the room at once;
+    other workers pick them up when the entry expires.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._cache = TTLCache(maxsize, ttl)
+
+    async def get(self, room_id: uuid.UUID, db: AsyncSession) -> frozenset[uuid.UUID]:
+        members = self._cache.get(room_id)
+        if members is None:
+            result = await db.execute(select(RoomMember.user_id).where(RoomMember.room_id == room_id))
+            members = frozenset(result.scalars().all())
+            self._cache.set(room_id, members)
+        return members
+
+    def invalidate(self, room_id: uuid.UUID):
+        self._cache.pop(room_id)
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+
+room_members = RoomMembers(settings.ROOM_MEMBER_CACHE_SIZE, settings.ROOM_MEMBER_CACHE_TTL_SECONDS)
+
+
+async def post_room_message(
+    db: AsyncSession, room_id: uuid.UUID, sender_id: uuid.UUID, content: str
+) -> RoomMessage:
+    """Store one message for the whole room and commit.
+
+    Taking the next seq locks the room row until commit, so a room's seqs are
+    gap-free and become visible in order. The sender's read cursor moves
+    with it; nobody else's row is touched.
+    """
+    seq = (
+        await db.execute(
+            update(Room)
+            .where(Room.id == room_id)
+            .values(last_seq=Room.last_seq + 1, last_at=func.now())
+            .returning(Room.last_seq)
+        )
+    ).scalar_one()
+    msg = RoomMessage(id=uuid7(), room_id=room_id, sender_id=sender_id, seq=seq, content=content)
+    msg.created_at = (
+        await db.execute(
+            insert(RoomMessage)
+            .values(id=msg.id, room_id=room_id, sender_id=sender_id, seq=seq, content=content)
+            .returning(RoomMessage.created_at)
+        )
+    ).scalar_one()
+    await db.execute(
+        update(RoomMember)
+        .where(RoomMember.room_id == room_id, RoomMember.user_id == sender_id)
+        .values(last_read_seq=seq)
+    )
+    await db.commit()
+    return msg
+
+
+def room_message_payload(msg: RoomMessage, sender_username: str) -> dict:
+    return {
+        "type": "room_message",
+        "id": str(msg.id),
+        "room_id": str(msg.room_id),
+        "sender_id": str(msg.sender_id),
+        "sender_username": sender_username,
+        "content": msg.content,
+        "seq": msg.seq,
+        "created_at": msg.created_at.isoformat(),
+    }
@@ -0,0 +1,142 @@
+import hashlib
+import time
+import uuid
+from dataclasses import dataclass
+
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.security import decode_token_claims
+from app.db.session import AsyncSessionLocal
+from app.models.user import User
+
+
+@dataclass(frozen=True, slots=True)
+class AuthUser:
+    """The part of a user row that authenticated requests need."""
+
+    id: uuid.UUID
+    username: str
+    is_active: bool
+
+
+class UserCache:
+    """TTL+LRU caches of verified access tokens and authenticated users.
+
+    Tokens are keyed by their SHA-256 digest, so a hit costs a hash instead
+    of a signature check and raw tokens are not kept in memory; an entry
+    never outlives the token's ``exp``. Users are dropped on ``invalidate``
+    (called automatically whenever a ``User`` row is updated through the ORM
+    in this process). Bulk ``update(User)`` statements, other workers and
+    out-of-band SQL bypass that hook: their changes, deactivation included,
+    are seen only once the entry expires, after at most ``ttl`` seconds.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, token_maxsize: int, token_ttl: float):
+        self.claims = TTLCache(token_maxsize, token_ttl)
+        self.users = TTLCache(maxsize, ttl)
+
+    def user_id_from_token(self, token: str) -> uuid.UUID | None:
+        digest = hashlib.sha256(token.encode()).digest()
+        user_id = self.claims.get(digest)
+        if user_id is not None:
+            return user_id
+        payload = decode_token_claims(token)
+        if not payload:
+            return None
+        try:
+            user_id = uuid.UUID(payload["sub"])
+        except ValueError:
+            return None
+        ttl = payload["exp"] - time.time() if "exp" in payload else None
+        self.claims.set(digest, user_id, ttl)
+        return user_id
+
+    async def get_user(self, user_id: uuid.UUID, db: AsyncSession) -> AuthUser | None:
+        user = self.users.get(user_id)
+        if user is not None:
+            return user
+        result = await db.execute(
+            select(User.id, User.username, User.is_active).where(User.id == user_id)
+        )
+        row = result.one_or_none()
+        if row is None:
+            return None
+        user = AuthUser(id=row.id, username=row.username, is_active=row.is_active)
+        self.users.set(user_id, user)
+        return user
+
+    def invalidate(self, user_id: uuid.UUID):
+        self.users.pop(user_id)
+
+    def clear(self):
+        self.claims.clear()
+        self.users.clear()
+
+    def stats(self) -> dict:
+        return {"claims": self.claims.stats(), "users": self.users.stats()}
+
+
+class KnownUsers:
+    """Which user ids exist, so sends can check recipients without a query.
+
+    Ids found to exist stay in a bounded LRU for ``ttl`` seconds; ids found
+    missing are remembered for only ``missing_ttl``, so a user who registers
+    on another worker becomes reachable almost at once. Registrations on this
+    worker are added directly. The foreign keys still have the final say.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, missing_ttl: float):
+        self.known = TTLCache(maxsize, ttl)
+        self.unknown = TTLCache(maxsize, missing_ttl)
+
+    def add(self, user_id: uuid.UUID):
+        self.known.set(user_id, True)
+        self.unknown.pop(user_id)
+
+    async def exists(self, user_id: uuid.UUID, db: AsyncSession | None = None) -> bool:
+        return not await self.missing({user_id}, db)
+
+    async def missing(self, user_ids: set[uuid.UUID], db: AsyncSession | None = None) -> set[uuid.UUID]:
+        """The ids in ``user_ids`` with no user; cache misses cost one ``IN`` query.
+
+        Without ``db`` a session is opened only if a lookup is needed.
+        """
+        missing = {user_id for user_id in user_ids if user_id in self.unknown}
+        pending = [user_id for user_id in user_ids if user_id not in missing and user_id not in self.known]
+        if not pending:
+            return missing
+        stmt = select(User.id).where(User.id.in_(pending))
+        if db is None:
+            async with AsyncSessionLocal() as db:
+                found = set((await db.execute(stmt)).scalars())
+        else:
+            found = set((await db.execute(stmt)).scalars())
+        for user_id in pending:
+            if user_id in found:
+                self.known.set(user_id, True)
+            else:
+                self.unknown.set(user_id, True)
+                missing.add(user_id)
+        return missing
+
+    def stats(self) -> dict:
+        return {"known": self.known.stats(), "unknown": self.unknown.stats()}
+
+
+user_cache = UserCache(
+    settings.USER_CACHE_SIZE,
+    settings.USER_CACHE_TTL_SECONDS,
+    settings.TOKEN_CACHE_SIZE,
+    settings.TOKEN_CACHE_TTL_SECONDS,
+)
+known_users = KnownUsers(
+    settings.KNOWN_USERS_CACHE_SIZE, settings.KNOWN_USERS_TTL_SECONDS, settings.UNKNOWN_USERS_TTL_SECONDS
+)
+
+
+@event.listens_for(User, "after_update")
+def _invalidate_updated_user(mapper, connection, target: User):
+    user_cache.invalidate(target.id)
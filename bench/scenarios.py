@@ -0,0 +1,165 @@
+import asyncio
+import json
+import random
+import time
+import uuid
+
+import httpx
+import websockets
+
+from bench.seed import BENCH_PASSWORD
+from bench.stats import summarize
+
+
+def auth(token: str) -> dict:
+    return {"Authorization": f"Bearer {token}"}
+
+
+async def _drive(call, total: int, concurrency: int) -> dict:
+    """Run ``call(i)`` ``total`` times with at most ``concurrency`` in flight."""
+    samples: list[float] = []
+    errors = 0
+    queue = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for i in queue:
+            start = time.perf_counter()
+            try:
+                await call(i)
+            except Exception:
+                errors += 1
+                continue
+            samples.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    summary = summarize(samples, time.perf_counter() - started)
+    summary["errors"] = errors
+    return summary
+
+
+async def login(client: httpx.AsyncClient, usernames: list[str], total: int, concurrency: int) -> dict:
+    async def call(i):
+        r = await client.post(
+            "/api/v1/auth/login",
+            json={"username": usernames[i % len(usernames)], "password": BENCH_PASSWORD},
+        )
+        r.raise_for_status()
+
+    return await _drive(call, total, concurrency)
+
+
+async def send_dm(
+    client: httpx.AsyncClient, tokens: list[str], ids: list[uuid.UUID], total: int, concurrency: int
+) -> dict:
+    async def call(i):
+        sender = i % len(tokens)
+        recipient = (sender + 1) % len(ids)
+        r = await client.post(
+            "/api/v1/messages/dm",
+            json={"recipient_id": str(ids[recipient]), "content": f"bench {i}"},
+            headers=auth(tokens[sender]),
+        )
+        r.raise_for_status()
+
+    return await _drive(call, total, concurrency)
+
+
+async def paginate(
+    client: httpx.AsyncClient, path: str, token: str, pages: int, limit: int, params: dict | None = None
+) -> dict:
+    """Walk ``pages`` keyset pages of ``path`` following X-Next-Cursor."""
+    samples: list[float] = []
+    cursor = None
+    for _ in range(pages):
+        query = {**(params or {}), "limit": limit}
+        if cursor:
+            query["before"] = cursor
+        start = time.perf_counter()
+        r = await client.get(path, params=query, headers=auth(token))
+        samples.append(time.perf_counter() - start)
+        r.raise_for_status()
+        cursor = r.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    return summarize(samples)
+
+
+async def search(
+    client: httpx.AsyncClient, token: str, queries: list[str], total: int, concurrency: int
+) -> dict:
+    """First page of each query in turn, ``total`` requests in all."""
+
+    async def call(i):
+        r = await client.get(
+            "/api/v1/messages/search", params={"q": queries[i % len(queries)]}, headers=auth(token)
+        )
+        r.raise_for_status()
+
+    return await _drive(call, total, concurrency)
+
+
+async def websocket_delivery(
+    ws_base: str,
+    tokens: list[str],
+    ids: list[uuid.UUID],
+    sockets: int,
+    messages: int,
+    rate: float,
+) -> dict:
+    """End-to-end latency from a sender's frame to the recipient's socket."""
+    sent_at: dict[str, float] = {}
+    samples: list[float] = []
+    done = asyncio.Event()
+    conns: list = []
+
+    async def open_socket(i: int):
+        ws = await websockets.connect(f"{ws_base}/ws/chat?token={tokens[i]}", max_queue=None)
+        conns.append((i, ws))
+
+    async def reader(i: int, ws):
+        me = str(ids[i])
+        try:
+            async for raw in ws:
+                frame = json.loads(raw)
+                if frame.get("type") == "ping":
+                    await ws.send('{"type": "pong"}')
+                    continue
+                if frame.get("recipient_id") != me or frame.get("sender_id") == me:
+                    continue
+                start = sent_at.pop(frame.get("content"), None)
+                if start is not None:
+                    samples.append(time.perf_counter() - start)
+                    if len(samples) >= messages:
+                        done.set()
+        except websockets.ConnectionClosed:
+            pass
+
+    connect_started = time.perf_counter()
+    for batch in range(0, sockets, 200):
+        await asyncio.gather(*(open_socket(i) for i in range(batch, min(batch + 200, sockets))))
+    connect_elapsed = time.perf_counter() - connect_started
+    readers = [asyncio.create_task(reader(i, ws)) for i, ws in conns]
+
+    by_index = dict(conns)
+    for n in range(messages):
+        sender, recipient = random.sample(range(sockets), 2)
+        marker = f"ws-{n}"
+        sent_at[marker] = time.perf_counter()
+        await by_index[sender].send(json.dumps({"recipient_id": str(ids[recipient]), "content": marker}))
+        await asyncio.sleep(1 / rate)
+
+    try:
+        await asyncio.wait_for(done.wait(), timeout=30)
+    except asyncio.TimeoutError:
+        pass
+    for task in readers:
+        task.cancel()
+    await asyncio.gather(*(ws.close() for _, ws in conns), return_exceptions=True)
+
+    summary = summarize(samples)
+    summary["sockets"] = sockets
+    summary["lost"] = len(sent_at)
+    summary["connect_seconds"] = round(connect_elapsed, 3)
+    return summary
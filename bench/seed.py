@@ -0,0 +1,95 @@
+import uuid
+
+import asyncpg
+import bcrypt
+
+BENCH_PASSWORD = "bench-password"
+
+
+async def create_users(conn: asyncpg.Connection, count: int, prefix: str) -> list[uuid.UUID]:
+    """Insert ``count`` users sharing one precomputed bcrypt hash."""
+    hashed = bcrypt.hashpw(BENCH_PASSWORD.encode(), bcrypt.gensalt()).decode()
+    ids = [uuid.uuid4() for _ in range(count)]
+    await conn.copy_records_to_table(
+        "users",
+        records=[
+            (user_id, f"{prefix}{i}", f"{prefix}{i}@bench.invalid", hashed, True)
+            for i, user_id in enumerate(ids)
+        ],
+        columns=["id", "username", "email", "hashed_password", "is_active"],
+    )
+    return ids
+
+
+async def create_history(
+    conn: asyncpg.Connection, a: uuid.UUID, b: uuid.UUID, count: int, chunk: int = 100_000
+):
+    """Insert ``count`` messages alternating between ``a`` and ``b``, one per second back in time.
+
+    Each message also carries one of 100 ``topicN`` words, so searches for a
+    topic match 1% of the history and searches for ``bench`` match all of it.
+    """
+    # Rows outside the monthly partitions would all land in the default one
+    await conn.execute(
+        """
+        SELECT direct_messages_create_partition(month)
+        FROM generate_series(
+            date_trunc('month', now() - make_interval(secs => $1::int)), now(), interval '1 month'
+        ) AS month
+        """,
+        count,
+    )
+    for start in range(0, count, chunk):
+        await conn.execute(
+            """
+            INSERT INTO direct_messages (id, sender_id, recipient_id, content, created_at)
+            SELECT
+                gen_random_uuid(),
+                CASE WHEN g % 2 = 0 THEN $1::uuid ELSE $2::uuid END,
+                CASE WHEN g % 2 = 0 THEN $2::uuid ELSE $1::uuid END,
+                'bench message ' || g || ' topic' || (g % 100),
+                now() - make_interval(secs => g)
+            FROM generate_series($3::int, $4::int) AS g
+            """,
+            a,
+            b,
+            start + 1,
+            min(start + chunk, count),
+        )
+
+
+async def create_fan_in(conn: asyncpg.Connection, target: uuid.UUID, senders: list[uuid.UUID]):
+    """One message from each sender to ``target`` so its inbox has many conversations."""
+    await conn.execute(
+        """
+        INSERT INTO direct_messages (id, sender_id, recipient_id, content, created_at)
+        SELECT gen_random_uuid(), s, $1::uuid, 'hello', now() - make_interval(secs => n)
+        FROM unnest($2::uuid[]) WITH ORDINALITY AS t(s, n)
+        """,
+        target,
+        senders,
+    )
+
+
+async def rebuild_conversations(conn: asyncpg.Connection):
+    """Recompute the conversations table from direct_messages after bulk inserts."""
+    await conn.execute(
+        """
+        INSERT INTO conversations (
+            user_a_id, user_b_id, last_message_id, last_sender_id, last_at,
+            unread_a, unread_b, last_read_a_at, last_read_b_at
+        )
+        SELECT DISTINCT ON (LEAST(sender_id, recipient_id), GREATEST(sender_id, recipient_id))
+            LEAST(sender_id, recipient_id), GREATEST(sender_id, recipient_id),
+            id, sender_id, created_at, 0, 0, created_at, created_at
+        FROM direct_messages
+        ORDER BY LEAST(sender_id, recipient_id), GREATEST(sender_id, recipient_id),
+                 created_at DESC, id DESC
+        ON CONFLICT (user_a_id, user_b_id) DO UPDATE SET
+            last_message_id = excluded.last_message_id,
+            last_sender_id = excluded.last_sender_id,
+            last_at = excluded.last_at
+        """
+    )
+    await conn.execute("ANALYZE direct_messages")
+    await conn.execute("ANALYZE conversations")
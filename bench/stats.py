@@ -0,0 +1,23 @@
+import statistics
+
+
+def summarize(samples: list[float], elapsed: float | None = None) -> dict:
+    """Latency summary in milliseconds (plus throughput when ``elapsed`` is given)."""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def pct(p: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))] * 1000, 3)
+
+    summary = {
+        "count": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+        "p50_ms": pct(50),
+        "p95_ms": pct(95),
+        "p99_ms": pct(99),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+    if elapsed:
+        summary["per_second"] = round(len(ordered) / elapsed, 1)
+    return summary
@@ -0,0 +1,38 @@
+import asyncio
+
+
+class FakeWebSocket:
+    """Just enough of a Starlette WebSocket for ConnectionManager.
+
+    Sends block until ``unblock()`` so tests can fill a connection's queue.
+    """
+
+    def __init__(self, subprotocols: list[str] | None = None):
+        self.scope = {"subprotocols": subprotocols or []}
+        self.sent: list[str | bytes] = []
+        self.closed_with: int | None = None
+        self._open = asyncio.Event()
+
+    def unblock(self):
+        self._open.set()
+
+    async def accept(self, subprotocol=None):
+        # Yield like a real handshake, so concurrent connects interleave
+        await asyncio.sleep(0)
+
+    async def close(self, code: int = 1000):
+        self.closed_with = code
+
+    async def send_text(self, data: str):
+        await self._open.wait()
+        self.sent.append(data)
+
+    async def send_bytes(self, data: bytes):
+        await self._open.wait()
+        self.sent.append(data)
+
+
+async def settle():
+    """Let spawned tasks (backplane broadcasts, writers) run."""
+    for _ in range(10):
+        await asyncio.sleep(0)
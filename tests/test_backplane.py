@@ -0,0 +1,86 @@
+import asyncio
+
+from app.services.backplane import InMemoryBackplane, InMemoryHub
+
+from fakes import settle
+
+
+class Node:
+    def __init__(self, hub: InMemoryHub, node_id: str):
+        self.backplane = InMemoryBackplane(hub, node_id)
+        self.delivered: list[tuple[list[str], dict]] = []
+
+    async def _deliver(self, user_ids: list[str], data: dict):
+        self.delivered.append((user_ids, data))
+
+    async def start(self):
+        await self.backplane.start(self._deliver)
+        return self
+
+
+def test_publish_reaches_only_the_node_holding_the_user():
+    async def run():
+        hub = InMemoryHub()
+        a, b, c = [await Node(hub, name).start() for name in "abc"]
+        a.backplane.join("alice")
+        await settle()
+
+        await b.backplane.publish(["alice", "nobody"], {"text": "hi"})
+
+        assert a.delivered == [(["alice"], {"text": "hi"})]
+        assert c.delivered == []
+        assert b.backplane.status("alice") == "online"
+        assert b.backplane.status("nobody") == "offline"
+
+    asyncio.run(run())
+
+
+def test_late_node_learns_existing_routes():
+    async def run():
+        hub = InMemoryHub()
+        a = await Node(hub, "a").start()
+        a.backplane.join("alice")
+        a.backplane.set_away("alice", True)
+        await settle()
+
+        late = await Node(hub, "late").start()
+
+        assert late.backplane.routes.nodes_for("alice") == {"a"}
+        assert late.backplane.status("alice") == "away"
+
+    asyncio.run(run())
+
+
+def test_leave_and_bye_clear_routes():
+    async def run():
+        hub = InMemoryHub()
+        a, b = [await Node(hub, name).start() for name in "ab"]
+        a.backplane.join("alice")
+        a.backplane.join("bob")
+        await settle()
+
+        a.backplane.leave("alice")
+        await settle()
+        assert b.backplane.status("alice") == "offline"
+
+        await a.backplane.stop()
+        assert b.backplane.status("bob") == "offline"
+
+    asyncio.run(run())
+
+
+def test_large_fan_out_is_chunked():
+    async def run():
+        hub = InMemoryHub()
+        a, b = [await Node(hub, name).start() for name in "ab"]
+        users = [f"user-{i}" for i in range(250)]
+        for user in users:
+            a.backplane.join(user)
+        await settle()
+
+        await b.backplane.publish(users, {"text": "hi"})
+
+        assert [len(chunk) for chunk, _ in a.delivered] == [100, 100, 50]
+        assert [user for chunk, _ in a.delivered for user in chunk] == users
+
+    asyncio.run(run())
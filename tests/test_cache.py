@@ -0,0 +1,46 @@
+from app.core import cache
+from app.core.cache import TTLCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_entries_expire_and_the_oldest_is_evicted(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, "monotonic", clock)
+    c = TTLCache(maxsize=2, ttl=10)
+    c.set("a", 1)
+    c.set("b", 2)
+    c.set("short", 3, ttl=1)
+
+    assert "a" not in c
+    assert c.get("b") == 2
+    clock.now += 1
+    assert c.get("short") is None
+    clock.now += 9
+    assert c.get("b") is None
+    assert c.stats() == {"size": 0, "hits": 1, "misses": 3}
+
+
+def test_get_refreshes_recency():
+    c = TTLCache(maxsize=2, ttl=10)
+    c.set("a", 1)
+    c.set("b", 2)
+    c.get("a")
+    c.set("c", 3)
+
+    assert "a" in c and "b" not in c and "c" in c
+
+
+def test_ttl_is_capped_and_non_positive_ttl_is_not_stored():
+    c = TTLCache(maxsize=10, ttl=10)
+    c.set("past", 1, ttl=-5)
+    c.set("long", 2, ttl=1000)
+
+    assert "past" not in c
+    assert c._data["long"][0] <= cache.time.monotonic() + 10
@@ -0,0 +1,133 @@
+import asyncio
+import uuid
+
+from app.services.backplane import InMemoryBackplane
+from app.services.connection_manager import (
+    IDLE_CLOSE_CODE,
+    SLOW_CONSUMER_CLOSE_CODE,
+    TOO_MANY_CONNECTIONS_CLOSE_CODE,
+    ConnectionManager,
+)
+
+from fakes import FakeWebSocket, settle
+
+
+async def _connected(policy: str, queue_size: int = 2):
+    manager = ConnectionManager(InMemoryBackplane(node_id="test"))
+    manager.queue_size = queue_size
+    manager.overflow_policy = policy
+    await manager.start()
+    user_id = uuid.uuid4()
+    websocket = FakeWebSocket()
+    conn = await manager.connect(user_id, websocket)
+    return manager, user_id, websocket, conn
+
+
+def test_drop_oldest_keeps_newest_frames():
+    async def run():
+        manager, user_id, websocket, conn = await _connected("drop_oldest")
+        # The writer takes the first frame and blocks sending it
+        await manager.send_to_user(user_id, {"n": 0})
+        await settle()
+        for n in range(1, 5):
+            await manager.send_to_user(user_id, {"n": n})
+
+        assert [frame.data["n"] for frame in conn.queue] == [3, 4]
+        assert manager.dropped == 2
+
+        websocket.unblock()
+        await settle()
+        assert websocket.sent == ['{"n":0}', '{"n":3}', '{"n":4}']
+        await manager.stop()
+
+    asyncio.run(run())
+
+
+def test_disconnect_closes_slow_consumer():
+    async def run():
+        manager, user_id, websocket, conn = await _connected("disconnect")
+        await manager.send_to_user(user_id, {"n": 0})
+        await settle()
+        for n in range(1, 4):
+            await manager.send_to_user(user_id, {"n": n})
+        await settle()
+
+        assert manager.slow_disconnects == 1
+        assert websocket.closed_with == SLOW_CONSUMER_CLOSE_CODE
+        assert manager.stats()["connections"] == 0
+        assert manager.backplane.status(str(user_id)) == "offline"
+        await manager.stop()
+
+    asyncio.run(run())
+
+
+
+def test_connection_cap():
+    async def run():
+        manager, user_id, _, _ = await _connected("drop_oldest")
+        manager.max_per_user = 1
+        websocket = FakeWebSocket()
+
+        assert await manager.connect(user_id, websocket) is None
+        assert manager.rejected == 1
+        assert websocket.closed_with == TOO_MANY_CONNECTIONS_CLOSE_CODE
+        await manager.stop()
+
+    asyncio.run(run())
+
+
+def test_concurrent_handshakes_respect_the_cap():
+    async def run():
+        manager = ConnectionManager(InMemoryBackplane(node_id="test"))
+        manager.max_per_user = 2
+        await manager.start()
+        user_id = uuid.uuid4()
+
+        conns = await asyncio.gather(*(manager.connect(user_id, FakeWebSocket()) for _ in range(5)))
+
+        assert sum(conn is not None for conn in conns) == 2
+        assert manager.rejected == 3
+        assert manager._handshakes == {}
+        await manager.stop()
+
+    asyncio.run(run())
+
+
+def test_reaper_survives_a_failed_pass(monkeypatch):
+    async def run():
+        manager = ConnectionManager(InMemoryBackplane(node_id="test"))
+        manager.ping_interval = 0.001
+        passes = []
+
+        def reap_once():
+            passes.append(None)
+            if len(passes) == 1:
+                raise RuntimeError("boom")
+
+        monkeypatch.setattr(manager, "_reap_once", reap_once)
+        await manager.start()
+        await asyncio.sleep(0.05)
+        await manager.stop()
+
+        assert len(passes) > 1
+
+    asyncio.run(run())
+
+
+def test_idle_sockets_are_pinged_then_closed():
+    async def run():
+        manager, user_id, websocket, conn = await _connected("drop_oldest", queue_size=10)
+        manager.ping_interval, manager.idle_timeout = 10, 30
+
+        conn.last_seen -= 15
+        manager._reap_once()
+        assert [frame.data for frame in conn.queue] == [{"type": "ping"}]
+
+        conn.last_seen -= 30
+        manager._reap_once()
+        await settle()
+        assert websocket.closed_with == IDLE_CLOSE_CODE
+        assert manager.idle_disconnects == 1 and manager._closing == set()
+        await manager.stop()
+
+    asyncio.run(run())
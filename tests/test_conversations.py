@@ -0,0 +1,57 @@
+import asyncio
+import uuid
+
+from app.core.ids import uuid7
+from app.models.conversation import ordered_pair
+from app.models.message import DirectMessage
+from app.services.conversations import record_messages
+
+
+class FakeSession:
+    def __init__(self):
+        self.statements = []
+
+    async def execute(self, stmt):
+        self.statements.append(stmt)
+
+
+def _rows(stmt) -> dict[tuple, dict]:
+    params = stmt.compile().params
+    rows = {}
+    i = 0
+    while f"user_a_id_m{i}" in params:
+        row = {k[: -len(f"_m{i}")]: v for k, v in params.items() if k.endswith(f"_m{i}")}
+        rows[(row["user_a_id"], row["user_b_id"])] = row
+        i += 1
+    return rows
+
+
+def test_batch_folds_into_one_row_per_pair():
+    alice, bob, carol = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    messages = [
+        DirectMessage(id=uuid7(), sender_id=alice, recipient_id=bob, content="1"),
+        DirectMessage(id=uuid7(), sender_id=alice, recipient_id=bob, content="2"),
+        DirectMessage(id=uuid7(), sender_id=bob, recipient_id=alice, content="3"),
+        DirectMessage(id=uuid7(), sender_id=carol, recipient_id=carol, content="note to self"),
+    ]
+    session = FakeSession()
+
+    asyncio.run(record_messages(session, messages))
+
+    [upsert] = session.statements
+    rows = _rows(upsert)
+    a, b = ordered_pair(alice, bob)
+    pair = rows[(a, b)]
+    unread = {a: pair["unread_a"], b: pair["unread_b"]}
+    assert unread == {bob: 2, alice: 1}
+    assert pair["last_message_id"] == messages[2].id
+    assert pair["last_sender_id"] == bob
+
+    note = rows[(carol, carol)]
+    assert note["unread_a"] == note["unread_b"] == 0
+
+
+def test_empty_batch_writes_nothing():
+    session = FakeSession()
+    asyncio.run(record_messages(session, []))
+    assert session.statements == []
@@ -0,0 +1,90 @@
+import json
+import uuid
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api.v1.endpoints import messages
+from app.core.config import settings
+from app.core.deps import get_current_user
+from app.main import app
+from app.services.user_cache import AuthUser
+
+USER = AuthUser(id=uuid.uuid4(), username="alice", is_active=True)
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+ROWS = [
+    SimpleNamespace(
+        id=uuid.uuid4(),
+        sender_id=USER.id,
+        recipient_id=uuid.uuid4(),
+        content=f"message {n}",
+        created_at=START + timedelta(minutes=n),
+        sender_seq=n,
+        recipient_seq=None,
+    )
+    for n in range(5)
+]
+
+
+class _Result:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def all(self):
+        return self.rows
+
+
+class PagedSessions:
+    """Serves ROWS a page at a time and records when sessions open and close."""
+
+    def __init__(self, page_size: int):
+        self.page_size = page_size
+        self.events = []
+        self.statements = []
+
+    def __call__(self):
+        return self
+
+    async def __aenter__(self):
+        self.events.append("open")
+        return self
+
+    async def __aexit__(self, *exc):
+        self.events.append("close")
+
+    async def execute(self, stmt):
+        start = len(self.statements) * self.page_size
+        self.statements.append(stmt)
+        return _Result(ROWS[start : start + self.page_size])
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(settings, "EXPORT_BATCH_SIZE", 2)
+    sessions = PagedSessions(page_size=2)
+    monkeypatch.setattr(messages, "AsyncSessionLocal", sessions)
+    app.dependency_overrides[get_current_user] = lambda: USER
+    yield TestClient(app), sessions
+    app.dependency_overrides.clear()
+
+
+def test_export_reads_each_page_in_its_own_session(client):
+    client, sessions = client
+
+    response = client.get("/api/v1/messages/export")
+
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["content"] for line in lines] == [row.content for row in ROWS]
+    assert sessions.events == ["open", "close"] * 3
+    # Later pages continue after the last row, bounded on created_at
+    sql = str(sessions.statements[1].compile())
+    assert "direct_messages.created_at >=" in sql and "LIMIT" in sql
+
+
+def test_export_rejects_a_bad_cursor_before_streaming(client):
+    client, sessions = client
+
+    assert client.get("/api/v1/messages/export", params={"after": "garbage"}).status_code == 400
+    assert sessions.events == []
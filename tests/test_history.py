@@ -0,0 +1,95 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.deps import get_current_user
+from app.core.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
+from app.db.session import get_db
+from app.main import app
+from app.models.message import DirectMessage, conversation_key
+from app.services.user_cache import AuthUser
+
+USER = AuthUser(id=uuid.uuid4(), username="alice", is_active=True)
+BOB = uuid.uuid4()
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def _message(n: int) -> DirectMessage:
+    return DirectMessage(
+        id=uuid.uuid4(), sender_id=USER.id, recipient_id=BOB, content=str(n), created_at=START + timedelta(minutes=n)
+    )
+
+
+class _Result:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def scalars(self):
+        return self
+
+    def all(self):
+        return self.rows
+
+
+class FakeSession:
+    def __init__(self, rows):
+        self.rows = rows
+        self.statements = []
+
+    async def execute(self, stmt):
+        self.statements.append(stmt)
+        return _Result(self.rows)
+
+
+@pytest.fixture
+def history(request):
+    session = FakeSession(getattr(request, "param", []))
+
+    async def fake_db():
+        yield session
+
+    app.dependency_overrides[get_db] = fake_db
+    app.dependency_overrides[get_current_user] = lambda: USER
+    yield TestClient(app), session
+    app.dependency_overrides.clear()
+
+
+def _get(client, **params):
+    return client.get(f"/api/v1/messages/dm/{BOB}", params=params)
+
+
+def test_before_and_after_together_are_rejected(history):
+    client, session = history
+    cursor = encode_cursor(START, uuid.uuid4())
+
+    assert _get(client, before=cursor, after=cursor).status_code == 400
+    assert _get(client, before="garbage").status_code == 400
+    assert session.statements == []
+
+
+@pytest.mark.parametrize("history", [[_message(2), _message(1)]], indirect=True)
+def test_full_page_sets_the_next_cursor(history):
+    client, session = history
+
+    response = _get(client, limit=2, before=encode_cursor(START + timedelta(hours=1), uuid.uuid4()))
+
+    assert [m["content"] for m in response.json()] == ["2", "1"]
+    created_at, message_id = decode_cursor(response.headers[NEXT_CURSOR_HEADER], datetime, uuid.UUID)
+    assert (created_at, message_id) == (START + timedelta(minutes=1), session.rows[-1].id)
+    sql = str(session.statements[0].compile())
+    assert "direct_messages.conversation_key =" in sql
+    assert "direct_messages.created_at <=" in sql
+    assert session.statements[0].compile().params["conversation_key_1"] == conversation_key(USER.id, BOB)
+
+
+@pytest.mark.parametrize("history", [[_message(1), _message(2)]], indirect=True)
+def test_after_pages_forward_and_returns_newest_first(history):
+    client, session = history
+
+    response = _get(client, limit=5, after=encode_cursor(START, uuid.uuid4()))
+
+    assert [m["content"] for m in response.json()] == ["2", "1"]
+    assert NEXT_CURSOR_HEADER not in response.headers
+    assert "direct_messages.created_at >=" in str(session.statements[0].compile())
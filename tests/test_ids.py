@@ -0,0 +1,20 @@
+import uuid
+
+from app.core import ids
+from app.core.ids import uuid7
+
+
+def test_uuid7_is_version_7_and_increasing():
+    generated = [uuid7() for _ in range(10_000)]
+
+    assert all(u.version == 7 and u.variant == uuid.RFC_4122 for u in generated)
+    assert generated == sorted(generated)
+    assert len(set(generated)) == len(generated)
+
+
+def test_uuid7_counter_overflow_borrows_next_millisecond(monkeypatch):
+    monkeypatch.setattr(ids.time, "time_ns", lambda: 1_700_000_000_000 * 1_000_000)
+    generated = [uuid7() for _ in range(5000)]
+
+    assert generated == sorted(generated)
+    assert generated[-1].int >> 80 > generated[0].int >> 80
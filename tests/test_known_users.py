@@ -0,0 +1,65 @@
+import asyncio
+import uuid
+
+from app.core import cache
+from app.services.user_cache import KnownUsers
+
+
+class _Result:
+    def __init__(self, ids):
+        self.ids = ids
+
+    def scalars(self):
+        return iter(self.ids)
+
+
+class FakeSession:
+    """Answers ``SELECT id ... WHERE id IN (...)`` from a set of existing ids."""
+
+    def __init__(self, existing):
+        self.existing = existing
+        self.queries: list[set] = []
+
+    async def execute(self, stmt):
+        asked = set(stmt.whereclause.right.value)
+        self.queries.append(asked)
+        return _Result(asked & self.existing)
+
+
+def test_misses_cost_one_query_and_results_are_cached():
+    alice, bob, ghost = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    db = FakeSession({alice, bob})
+    users = KnownUsers(maxsize=10, ttl=60, missing_ttl=60)
+
+    assert asyncio.run(users.missing({alice, bob, ghost}, db)) == {ghost}
+    assert db.queries == [{alice, bob, ghost}]
+
+    assert asyncio.run(users.missing({alice, bob, ghost}, db)) == {ghost}
+    assert asyncio.run(users.exists(alice, db))
+    assert len(db.queries) == 1
+
+
+def test_missing_ids_are_rechecked_after_the_short_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    carol = uuid.uuid4()
+    db = FakeSession(set())
+    users = KnownUsers(maxsize=10, ttl=60, missing_ttl=2)
+
+    assert not asyncio.run(users.exists(carol, db))
+    db.existing.add(carol)
+    assert not asyncio.run(users.exists(carol, db))
+    now[0] += 2
+    assert asyncio.run(users.exists(carol, db))
+    assert len(db.queries) == 2
+
+
+def test_add_clears_a_cached_miss():
+    dave = uuid.uuid4()
+    db = FakeSession(set())
+    users = KnownUsers(maxsize=10, ttl=60, missing_ttl=60)
+
+    assert not asyncio.run(users.exists(dave, db))
+    users.add(dave)
+    assert asyncio.run(users.exists(dave, db))
+    assert len(db.queries) == 1
@@ -0,0 +1,90 @@
+import asyncio
+import uuid
+
+import pytest
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from app.services.message_writer import MessageWriter
+
+
+def _writer(batch_size: int, fail_on: str | None = None, error: Exception | None = None):
+    writer = MessageWriter(batch_size=batch_size, max_delay=0.01)
+    writer.inserts = []
+
+    async def insert(messages):
+        writer.inserts.append([msg.content for msg in messages])
+        if error is not None:
+            raise error
+        if any(msg.content == fail_on for msg in messages):
+            raise IntegrityError("INSERT", {}, Exception("unknown recipient"))
+
+    writer._insert = insert
+    return writer
+
+
+def test_writes_are_grouped_into_batches():
+    async def run():
+        writer = _writer(batch_size=3)
+        await writer.start()
+        sender, recipient = uuid.uuid4(), uuid.uuid4()
+        messages = await asyncio.gather(*(writer.write(sender, recipient, str(n)) for n in range(5)))
+        await writer.stop()
+
+        assert [msg.content for msg in messages] == ["0", "1", "2", "3", "4"]
+        assert writer.inserts == [["0", "1", "2"], ["3", "4"]]
+        assert writer.stats()["batches"] == 2
+
+    asyncio.run(run())
+
+
+def test_bad_row_fails_alone():
+    async def run():
+        writer = _writer(batch_size=10, fail_on="bad")
+        await writer.start()
+        sender, recipient = uuid.uuid4(), uuid.uuid4()
+        results = await asyncio.gather(
+            *(writer.write(sender, recipient, content) for content in ("a", "bad", "c")),
+            return_exceptions=True,
+        )
+        await writer.stop()
+
+        assert results[0].content == "a"
+        assert isinstance(results[1], IntegrityError)
+        assert results[2].content == "c"
+        assert writer.inserts == [["a", "bad", "c"], ["a"], ["bad"], ["c"]]
+        assert writer.stats()["failures"] == 1
+
+    asyncio.run(run())
+
+
+def test_outage_fails_the_batch_without_row_retries():
+    async def run():
+        writer = _writer(batch_size=10, error=OperationalError("INSERT", {}, Exception("connection refused")))
+        await writer.start()
+        sender, recipient = uuid.uuid4(), uuid.uuid4()
+        results = await asyncio.gather(
+            *(writer.write(sender, recipient, str(n)) for n in range(3)), return_exceptions=True
+        )
+        await writer.stop()
+
+        assert all(isinstance(result, OperationalError) for result in results)
+        assert writer.inserts == [["0", "1", "2"]]
+        assert writer.stats()["failures"] == 3
+
+    asyncio.run(run())
+
+
+def test_stop_flushes_then_rejects_writes():
+    async def run():
+        writer = _writer(batch_size=100)
+        await writer.start()
+        sender, recipient = uuid.uuid4(), uuid.uuid4()
+        pending = asyncio.ensure_future(writer.write(sender, recipient, "last"))
+        await asyncio.sleep(0)
+        await writer.stop()
+
+        assert (await pending).content == "last"
+        with pytest.raises(RuntimeError):
+            await writer.write(sender, recipient, "too late")
+
+    asyncio.run(run())
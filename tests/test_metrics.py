@@ -0,0 +1,42 @@
+import pytest
+
+from app.core.metrics import Registry
+
+
+def test_counter_and_collected_render():
+    reg = Registry()
+    sent = reg.counter("chat_sent_total", "Messages sent", ("kind",))
+    sent.inc(kind="dm")
+    sent.inc(2, kind="dm")
+    sent.inc(kind='r"oom')
+    reg.gauge("chat_sockets", "Open sockets", lambda: 3)
+    reg.counter_from("chat_dropped_total", "Dropped frames", lambda: 7)
+
+    text = reg.render()
+    assert "# TYPE chat_sent_total counter" in text
+    assert 'chat_sent_total{kind="dm"} 3' in text
+    assert 'chat_sent_total{kind="r\\"oom"} 1' in text
+    assert "# TYPE chat_sockets gauge\nchat_sockets 3" in text
+    assert "# TYPE chat_dropped_total counter\nchat_dropped_total 7" in text
+    assert text.endswith("\n")
+
+
+def test_histogram_buckets_are_cumulative():
+    reg = Registry()
+    latency = reg.histogram("chat_send_seconds", "Send latency", buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 5.0):
+        latency.observe(value)
+
+    lines = reg.render().splitlines()
+    assert 'chat_send_seconds_bucket{le="0.1"} 1' in lines
+    assert 'chat_send_seconds_bucket{le="1.0"} 3' in lines
+    assert 'chat_send_seconds_bucket{le="+Inf"} 4' in lines
+    assert "chat_send_seconds_sum 6.05" in lines
+    assert "chat_send_seconds_count 4" in lines
+
+
+def test_duplicate_name_is_rejected():
+    reg = Registry()
+    reg.counter("chat_sent_total", "Messages sent")
+    with pytest.raises(ValueError):
+        reg.gauge("chat_sent_total", "Again", lambda: 0)
@@ -0,0 +1,48 @@
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import HTTPException, Response
+from fastapi.testclient import TestClient
+
+from app.core.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor, set_next_cursor
+from app.main import app
+
+
+def test_cursor_round_trips():
+    values = (0.25, datetime(2026, 1, 2, 3, 4, 5, 678, tzinfo=timezone.utc), uuid.uuid4())
+
+    cursor = encode_cursor(*values)
+
+    assert "=" not in cursor
+    assert decode_cursor(cursor, float, datetime, uuid.UUID) == values
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        "garbage!",
+        encode_cursor("not a date", str(uuid.uuid4())),
+        encode_cursor(datetime.now(timezone.utc), "not a uuid"),
+        # Wrong number of values
+        encode_cursor(datetime.now(timezone.utc)),
+        encode_cursor(datetime.now(timezone.utc), uuid.uuid4(), 1),
+    ],
+)
+def test_bad_cursor_is_a_400(cursor):
+    with pytest.raises(HTTPException) as exc:
+        decode_cursor(cursor, datetime, uuid.UUID)
+    assert exc.value.status_code == 400
+
+
+def test_next_cursor_header():
+    response = Response()
+    set_next_cursor(response, 1.5, "x")
+
+    assert decode_cursor(response.headers[NEXT_CURSOR_HEADER], float, str) == (1.5, "x")
+
+
+def test_browsers_may_read_the_next_cursor_header():
+    response = TestClient(app).get("/health", headers={"Origin": "https://chat.example"})
+
+    assert NEXT_CURSOR_HEADER in response.headers["access-control-expose-headers"]
@@ -0,0 +1,88 @@
+import asyncio
+import json
+import uuid
+from datetime import datetime, timezone
+
+from sqlalchemy import desc, select, tuple_
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.api.v1.endpoints.messages import messages_after, messages_before
+from app.core.pagination import encode_cursor
+from app.models.message import DirectMessage
+
+MONTHS = ["2026-01-01", "2026-02-01", "2026-03-01", "2026-04-01"]
+
+# A temp table shadows any real direct_messages, and everything is rolled back
+SCHEMA = [
+    """
+    CREATE TEMP TABLE direct_messages (
+        id uuid NOT NULL,
+        sender_id uuid NOT NULL,
+        recipient_id uuid NOT NULL,
+        conversation_key uuid,
+        content text NOT NULL,
+        search_vector tsvector,
+        sender_seq bigint,
+        recipient_seq bigint,
+        created_at timestamptz NOT NULL,
+        PRIMARY KEY (id, created_at)
+    ) PARTITION BY RANGE (created_at)
+    """,
+    *(
+        f"CREATE TEMP TABLE direct_messages_p{start[:7].replace('-', '_')} "
+        f"PARTITION OF direct_messages FOR VALUES FROM ('{start}') TO ('{end}')"
+        for start, end in zip(MONTHS, MONTHS[1:])
+    ),
+    "CREATE INDEX ON direct_messages (conversation_key, created_at, id)",
+]
+
+KEY = uuid.uuid4()
+CURSOR = encode_cursor(datetime(2026, 2, 10, tzinfo=timezone.utc), uuid.uuid4())
+
+
+def _relations(plan: dict) -> set[str]:
+    found = {plan["Relation Name"]} if "Relation Name" in plan else set()
+    for child in plan.get("Plans", ()):
+        found |= _relations(child)
+    return found
+
+
+def _scanned(database_url: str, condition) -> set[str]:
+    stmt = (
+        select(DirectMessage)
+        .where(DirectMessage.conversation_key == KEY, condition)
+        .order_by(desc(DirectMessage.created_at), desc(DirectMessage.id))
+        .limit(50)
+    )
+
+    async def run():
+        engine = create_async_engine(database_url)
+        try:
+            async with engine.connect() as conn:
+                for ddl in SCHEMA:
+                    await conn.exec_driver_sql(ddl)
+                # Literal values, so pruning happens at plan time and shows in EXPLAIN
+                sql = stmt.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True})
+                raw = (await conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {sql}")).scalar_one()
+                await conn.rollback()
+        finally:
+            await engine.dispose()
+        plan = json.loads(raw) if isinstance(raw, str) else raw
+        return _relations(plan[0]["Plan"])
+
+    return asyncio.run(run())
+
+
+def test_before_cursor_skips_newer_partitions(database_url):
+    assert _scanned(database_url, messages_before(CURSOR)) == {"direct_messages_p2026_01", "direct_messages_p2026_02"}
+
+
+def test_after_cursor_skips_older_partitions(database_url):
+    assert _scanned(database_url, messages_after(CURSOR)) == {"direct_messages_p2026_02", "direct_messages_p2026_03"}
+
+
+def test_row_comparison_alone_does_not_prune(database_url):
+    # Guards the test itself: if this starts pruning, the plain bound may be redundant
+    position = tuple_(DirectMessage.created_at, DirectMessage.id)
+    cutoff = tuple_(datetime(2026, 2, 10, tzinfo=timezone.utc), uuid.uuid4())
+    assert len(_scanned(database_url, position < cutoff)) == 3
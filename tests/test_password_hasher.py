@@ -0,0 +1,65 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.services.password_hasher import PasswordHasher
+
+
+def test_hash_and_verify_round_trip():
+    async def run():
+        hasher = PasswordHasher(workers=2, max_concurrency=2)
+        try:
+            hashed = await hasher.hash("s3cret")
+            return hashed, await hasher.verify("s3cret", hashed), await hasher.verify("wrong", hashed)
+        finally:
+            hasher.shutdown()
+
+    hashed, good, bad = asyncio.run(run())
+    assert hashed.startswith("$2") and good and not bad
+
+
+def test_work_is_bounded_and_off_the_event_loop():
+    running, peak = 0, 0
+    lock = threading.Lock()
+
+    def slow():
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        time.sleep(0.05)
+        with lock:
+            running -= 1
+        return True
+
+    async def run():
+        hasher = PasswordHasher(workers=4, max_concurrency=2)
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.005)
+
+        ticker = asyncio.create_task(tick())
+        try:
+            results = await asyncio.gather(*(hasher._run("verify", slow) for _ in range(6)))
+        finally:
+            ticker.cancel()
+            hasher.shutdown()
+        return results, ticks, hasher.stats()
+
+    results, ticks, stats = asyncio.run(run())
+    assert all(results)
+    assert peak == 2
+    # The loop kept running while bcrypt-sized work was in flight
+    assert ticks > 10
+    assert stats["calls"] == 6 and stats["waiting"] == 0 and stats["queue_seconds_max"] > 0
+
+
+def test_unknown_executor_kind():
+    with pytest.raises(ValueError):
+        PasswordHasher(kind="fibers")
@@ -0,0 +1,42 @@
+import asyncio
+import uuid
+
+from app.services.backplane import InMemoryBackplane, InMemoryHub
+from app.services.connection_manager import ConnectionManager
+from app.services.presence import PresenceService
+
+from fakes import FakeWebSocket, settle
+
+
+def test_each_socket_is_told_only_what_changed_for_it():
+    async def run():
+        hub = InMemoryHub()
+        here = ConnectionManager(InMemoryBackplane(hub, "here"))
+        there = ConnectionManager(InMemoryBackplane(hub, "there"))
+        await here.start()
+        await there.start()
+        presence = PresenceService(here, debounce=0.01, max_watch=10, typing_window=1)
+        bob = uuid.uuid4()
+
+        early_socket, late_socket = FakeWebSocket(), FakeWebSocket()
+        early_socket.unblock()
+        late_socket.unblock()
+        early = await here.connect(uuid.uuid4(), early_socket)
+        assert presence.watch(early, [str(bob)]) == {str(bob): "offline"}
+
+        bob_conn = await there.connect(bob, FakeWebSocket())
+        await settle()
+        late = await here.connect(uuid.uuid4(), late_socket)
+        assert presence.watch(late, [str(bob)]) == {str(bob): "online"}
+
+        there.disconnect(bob_conn)
+        await asyncio.sleep(0.05)
+
+        # Bob was back offline by the time the early watcher's update was
+        # due, so it hears nothing; the late watcher last saw him online
+        assert early_socket.sent == []
+        assert late_socket.sent == [f'{{"type":"presence","statuses":{{"{bob}":"offline"}}}}']
+        await here.stop()
+        await there.stop()
+
+    asyncio.run(run())
@@ -0,0 +1,100 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core import deps
+from app.core.config import settings
+from app.db.session import get_db
+from app.main import app
+from app.services import rate_limiter
+from app.services.rate_limiter import RateLimiter, TokenBucket
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_token_bucket_spends_burst_then_refills(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limiter.time, "monotonic", clock)
+    bucket = TokenBucket(rate=2.0, burst=3)
+
+    assert [bucket.take() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.take() == 0.5
+
+    clock.now += 0.5
+    assert bucket.take() == 0.0
+    clock.now += 60
+    assert [bucket.take() for _ in range(4)] == [0.0, 0.0, 0.0, 0.5]
+
+
+class _NoUser:
+    def scalar_one_or_none(self):
+        return None
+
+
+class FakeSession:
+    async def execute(self, stmt):
+        return _NoUser()
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(deps, "rate_limiter", RateLimiter())
+    monkeypatch.setattr(settings, "TRUSTED_PROXIES", "testclient, 10.0.0.2")
+
+    async def fake_db():
+        yield FakeSession()
+
+    app.dependency_overrides[get_db] = fake_db
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+def _login(client, username: str, address: str):
+    return client.post(
+        "/api/v1/auth/login",
+        json={"username": username, "password": "wrong"},
+        headers={"X-Forwarded-For": f"{address}, 10.0.0.2"},
+    )
+
+
+def test_failed_logins_elsewhere_do_not_lock_the_owner_out(client):
+    for _ in range(settings.LOGIN_RATE_BURST):
+        assert _login(client, "alice", "203.0.113.7").status_code == 401
+    assert _login(client, "alice", "203.0.113.7").status_code == 429
+
+    # Checked and rejected on the password, not by the limit
+    assert _login(client, "alice", "198.51.100.1").status_code == 401
+
+
+def test_address_bucket_spans_usernames(client):
+    for n in range(settings.LOGIN_RATE_BURST):
+        assert _login(client, f"user{n}", "203.0.113.7").status_code == 401
+    assert _login(client, "someone-else", "203.0.113.7").status_code == 429
+
+
+class _Request:
+    def __init__(self, host: str, forwarded: str | None = None):
+        self.client = type("Client", (), {"host": host})()
+        self.headers = {"x-forwarded-for": forwarded} if forwarded else {}
+
+
+@pytest.mark.parametrize(
+    "host, forwarded, expected",
+    [
+        ("203.0.113.7", None, "203.0.113.7"),
+        # Not from a trusted proxy: the header is the client's own claim
+        ("203.0.113.7", "1.2.3.4", "203.0.113.7"),
+        ("10.0.0.1", "203.0.113.7", "203.0.113.7"),
+        # A client can prepend anything; only the hop the proxies saw counts
+        ("10.0.0.1", "1.2.3.4, 203.0.113.7, 10.0.0.2", "203.0.113.7"),
+        ("10.0.0.1", None, "10.0.0.1"),
+    ],
+)
+def test_client_address(monkeypatch, host, forwarded, expected):
+    monkeypatch.setattr(settings, "TRUSTED_PROXIES", "10.0.0.1,10.0.0.2")
+    assert deps.client_address(_Request(host, forwarded)) == expected
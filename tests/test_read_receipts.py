@@ -0,0 +1,98 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy.sql import Select, Update
+
+from app.core.ids import uuid7
+from app.models.conversation import ordered_pair
+from app.models.message import DirectMessage
+from app.services import read_receipts as read_receipts_module
+from app.services.conversations import record_messages
+from app.services.read_receipts import ReadReceipts
+
+
+class _Result:
+    def tuples(self):
+        return self
+
+    def all(self):
+        return []
+
+    def __iter__(self):
+        return iter(())
+
+
+class FakeSession:
+    def __init__(self):
+        self.statements = []
+        self.committed = False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        pass
+
+    async def execute(self, stmt):
+        self.statements.append(stmt)
+        return _Result()
+
+    async def commit(self):
+        self.committed = True
+
+
+def test_keeps_the_newest_cursor():
+    receipts = ReadReceipts(manager=None, interval=1, max_pending=3)
+    reader, partner, room = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    t = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+    receipts.mark_direct(reader, partner, t + timedelta(seconds=5))
+    receipts.mark_direct(reader, partner, t)
+    receipts.mark_direct(reader, reader, t)
+    receipts.mark_room(reader, room, 7)
+    receipts.mark_room(reader, room, 9)
+    receipts.mark_room(reader, room, 8)
+
+    assert receipts._direct == {(reader, partner): t + timedelta(seconds=5)}
+    assert receipts._rooms == {(reader, room): 9}
+    assert receipts.stats()["received"] == 5
+    assert not receipts._full.is_set()
+
+    receipts.mark_room(partner, room, 1)
+    assert receipts._full.is_set()
+
+
+def test_flush_locks_conversations_in_key_order_before_updating(monkeypatch):
+    session = FakeSession()
+    monkeypatch.setattr(read_receipts_module, "AsyncSessionLocal", lambda: session)
+    receipts = ReadReceipts(manager=None, interval=1, max_pending=100)
+    users = [uuid.uuid4() for _ in range(6)]
+    t = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    for reader, partner in zip(users, reversed(users)):
+        receipts.mark_direct(reader, partner, t)
+
+    asyncio.run(receipts.flush())
+
+    lock, *updates = session.statements
+    assert isinstance(lock, Select) and lock._for_update_arg is not None
+    [pairs] = lock.compile().params.values()
+    assert pairs == sorted({ordered_pair(a, b) for a, b in zip(users, reversed(users))})
+    assert updates and all(isinstance(stmt, Update) for stmt in updates)
+    assert session.committed
+
+
+def test_message_writes_upsert_conversations_in_the_same_order():
+    session = FakeSession()
+    users = [uuid.uuid4() for _ in range(6)]
+    messages = [
+        DirectMessage(id=uuid7(), sender_id=sender, recipient_id=recipient, content="hi")
+        for sender, recipient in zip(users, reversed(users))
+    ]
+
+    asyncio.run(record_messages(session, messages))
+
+    [upsert] = session.statements
+    params = upsert.compile().params
+    pairs = [(params[f"user_a_id_m{i}"], params[f"user_b_id_m{i}"]) for i in range(3)]
+    assert pairs == sorted(pairs)
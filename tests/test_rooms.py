@@ -0,0 +1,76 @@
+import asyncio
+import uuid
+from datetime import datetime, timezone
+
+from sqlalchemy.sql import Insert, Select, Update
+
+from app.models.room import Room, RoomMember, RoomMessage
+from app.services.rooms import RoomMembers, post_room_message, room_message_payload
+
+NOW = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+class _Result:
+    def __init__(self, value):
+        self.value = value
+
+    def scalars(self):
+        return self
+
+    def all(self):
+        return list(self.value)
+
+    def scalar_one(self):
+        return self.value
+
+
+class FakeSession:
+    def __init__(self, *results):
+        self.results = list(results)
+        self.statements = []
+        self.committed = False
+
+    async def execute(self, stmt):
+        self.statements.append(stmt)
+        return _Result(self.results.pop(0) if self.results else None)
+
+    async def commit(self):
+        self.committed = True
+
+
+def test_members_are_cached_until_invalidated():
+    room, alice, bob = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    members = RoomMembers(maxsize=10, ttl=60)
+    db = FakeSession([alice], [alice, bob])
+
+    assert asyncio.run(members.get(room, db)) == {alice}
+    assert asyncio.run(members.get(room, db)) == {alice}
+    members.invalidate(room)
+    assert asyncio.run(members.get(room, db)) == {alice, bob}
+    assert len(db.statements) == 2
+
+
+def test_post_stores_one_row_and_moves_only_the_senders_cursor():
+    room, alice = uuid.uuid4(), uuid.uuid4()
+    db = FakeSession(7, NOW)
+
+    msg = asyncio.run(post_room_message(db, room, alice, "hi all"))
+
+    bump, store, cursor = db.statements
+    assert isinstance(bump, Update) and bump.table.name == Room.__tablename__
+    assert isinstance(store, Insert) and store.table.name == RoomMessage.__tablename__
+    assert isinstance(cursor, Update) and cursor.table.name == RoomMember.__tablename__
+    assert cursor.compile().params == {"last_read_seq": 7, "room_id_1": room, "user_id_1": alice}
+    assert db.committed
+    assert (msg.seq, msg.created_at, msg.content) == (7, NOW, "hi all")
+    assert room_message_payload(msg, "alice") == {
+        "type": "room_message",
+        "id": str(msg.id),
+        "room_id": str(room),
+        "sender_id": str(alice),
+        "sender_username": "alice",
+        "content": "hi all",
+        "seq": 7,
+        "created_at": NOW.isoformat(),
+    }
+    assert not any(isinstance(stmt, Select) for stmt in db.statements)
@@ -0,0 +1,97 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.dialects import postgresql
+
+from app.core.deps import get_current_user
+from app.core.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
+from app.db.session import get_db
+from app.main import app
+from app.services.user_cache import AuthUser
+
+USER = AuthUser(id=uuid.uuid4(), username="alice", is_active=True)
+BOB = uuid.uuid4()
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def _hit(n: int, rank: float):
+    return SimpleNamespace(
+        id=uuid.uuid4(),
+        sender_id=BOB,
+        recipient_id=USER.id,
+        content=f"lunch {n}",
+        created_at=START + timedelta(minutes=n),
+        sender_seq=n,
+        recipient_seq=n,
+        rank=rank,
+        snippet=f"<b>lunch</b> {n}",
+    )
+
+
+class _Result:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def all(self):
+        return self.rows
+
+
+class FakeSession:
+    def __init__(self, rows):
+        self.rows = rows
+        self.statements = []
+
+    async def execute(self, stmt):
+        self.statements.append(stmt)
+        return _Result(self.rows)
+
+
+@pytest.fixture
+def search():
+    session = FakeSession([_hit(2, 0.5), _hit(1, 0.25)])
+
+    async def fake_db():
+        yield session
+
+    app.dependency_overrides[get_db] = fake_db
+    app.dependency_overrides[get_current_user] = lambda: USER
+    yield TestClient(app), session
+    app.dependency_overrides.clear()
+
+
+def _sql(stmt) -> str:
+    return str(stmt.compile(dialect=postgresql.dialect()))
+
+
+def test_full_page_returns_snippets_and_a_rank_cursor(search):
+    client, session = search
+
+    response = client.get("/api/v1/messages/search", params={"q": '"lunch" -dinner', "limit": 2})
+
+    assert [hit["snippet"] for hit in response.json()] == ["<b>lunch</b> 2", "<b>lunch</b> 1"]
+    last = session.rows[-1]
+    assert decode_cursor(response.headers[NEXT_CURSOR_HEADER], float, datetime, uuid.UUID) == (
+        last.rank,
+        last.created_at,
+        last.id,
+    )
+    sql = _sql(session.statements[0])
+    assert "websearch_to_tsquery" in sql and "direct_messages.search_vector @@" in sql
+    # Headlines are built outside the LIMITed page, not for every match
+    assert sql.index("ts_headline") < sql.index("FROM (SELECT")
+
+
+def test_before_adds_a_keyset_bound_and_bad_cursors_are_400(search):
+    client, session = search
+    cursor = encode_cursor(0.5, START, uuid.uuid4())
+
+    response = client.get("/api/v1/messages/search", params={"q": "lunch", "with_user": str(BOB), "before": cursor})
+
+    assert response.status_code == 200 and NEXT_CURSOR_HEADER not in response.headers
+    sql = _sql(session.statements[0])
+    assert "(ts_rank(direct_messages.search_vector" in sql and "direct_messages.conversation_key =" in sql
+    assert client.get("/api/v1/messages/search", params={"q": "lunch", "before": "garbage"}).status_code == 400
+    assert len(session.statements) == 1
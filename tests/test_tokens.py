@@ -0,0 +1,47 @@
+import uuid
+
+from fastapi.testclient import TestClient
+from jose import jwt
+
+from app.core.config import settings
+from app.core.security import (
+    ACCESS_TOKEN,
+    REFRESH_TOKEN,
+    create_access_token,
+    create_refresh_token,
+    decode_token_claims,
+)
+from app.main import app
+from app.services.user_cache import UserCache
+
+SUBJECT = str(uuid.uuid4())
+
+
+def test_each_token_only_decodes_as_its_own_type():
+    access, refresh = create_access_token(SUBJECT), create_refresh_token(SUBJECT)
+
+    assert decode_token_claims(access)["sub"] == SUBJECT
+    assert decode_token_claims(refresh) is None
+    assert decode_token_claims(refresh, REFRESH_TOKEN)["sub"] == SUBJECT
+    assert decode_token_claims(access, REFRESH_TOKEN) is None
+
+
+def test_token_without_typ_is_an_access_token():
+    legacy = jwt.encode({"sub": SUBJECT}, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+
+    assert decode_token_claims(legacy, ACCESS_TOKEN)["sub"] == SUBJECT
+    assert decode_token_claims(legacy, REFRESH_TOKEN) is None
+
+
+def test_refresh_token_does_not_authenticate_requests():
+    cache = UserCache(maxsize=10, ttl=60, token_maxsize=10, token_ttl=60)
+
+    assert cache.user_id_from_token(create_refresh_token(SUBJECT)) is None
+    assert cache.user_id_from_token(create_access_token(SUBJECT)) == uuid.UUID(SUBJECT)
+    assert cache.user_id_from_token("not-a-token") is None
+
+
+def test_access_token_is_refused_by_refresh_endpoint():
+    response = TestClient(app).post("/api/v1/auth/refresh", json={"refresh_token": create_access_token(SUBJECT)})
+
+    assert response.status_code == 401
@@ -0,0 +1,182 @@
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from app.api.v1.endpoints import websocket
+from app.main import app
+from app.models.message import DirectMessage
+from app.services.rate_limiter import RateLimiter
+from app.services.user_cache import AuthUser
+
+USER = AuthUser(id=uuid.uuid4(), username="alice", is_active=True)
+BOB = uuid.uuid4()
+
+
+@pytest.fixture
+def client(monkeypatch):
+    async def user_from_token(token, db):
+        return USER if token == "good" else None
+
+    monkeypatch.setattr(websocket, "get_user_from_token", user_from_token)
+    monkeypatch.setattr(websocket, "rate_limiter", RateLimiter())
+    return TestClient(app)
+
+
+def _chat(client):
+    return client.websocket_connect("/ws/chat?token=good")
+
+
+def test_bad_token_is_refused(client):
+    with pytest.raises(WebSocketDisconnect) as exc:
+        with client.websocket_connect("/ws/chat?token=bad") as ws:
+            ws.receive_text()
+    assert exc.value.code == 4001
+
+
+@pytest.mark.parametrize(
+    "send, error",
+    [
+        (lambda ws: ws.send_text("{not json"), "Invalid frame"),
+        (lambda ws: ws.send_bytes(b"\x81\xa4type\xa4pong"), "Invalid frame"),
+        (lambda ws: ws.send_json([1, 2]), "Invalid frame"),
+        (lambda ws: ws.send_json({"type": "nope"}), "Unknown frame type"),
+        (lambda ws: ws.send_json({"recipient_id": str(BOB), "content": 5}), "recipient_id and content are required"),
+        (lambda ws: ws.send_json({"recipient_id": 123, "content": "hi"}), "Invalid recipient_id"),
+        (lambda ws: ws.send_json({"type": "room_message", "room_id": "x", "content": "hi"}), "Invalid room_id"),
+        (lambda ws: ws.send_json({"type": "resume", "last_seq": -1}), "Invalid last_seq"),
+        (lambda ws: ws.send_json({"type": "presence", "status": "busy"}), "status must be online or away"),
+    ],
+)
+def test_bad_frames_get_an_error_and_keep_the_socket(client, send, error):
+    with _chat(client) as ws:
+        send(ws)
+        assert ws.receive_json() == {"error": error}
+        # Still open and dispatching
+        ws.send_json({"type": "presence", "status": "away"})
+        ws.send_json({"type": "nope"})
+        assert ws.receive_json() == {"error": "Unknown frame type"}
+
+
+def test_message_is_written_and_echoed(client, monkeypatch):
+    written = []
+
+    async def exists(user_id, db=None):
+        return user_id == BOB
+
+    async def write(sender_id, recipient_id, content):
+        msg = DirectMessage(
+            id=uuid.uuid4(),
+            sender_id=sender_id,
+            recipient_id=recipient_id,
+            content=content,
+            created_at=datetime.now(timezone.utc),
+            sender_seq=1,
+            recipient_seq=1,
+        )
+        written.append(msg)
+        return msg
+
+    monkeypatch.setattr(websocket.known_users, "exists", exists)
+    monkeypatch.setattr(websocket.message_writer, "write", write)
+
+    with _chat(client) as ws:
+        ws.send_json({"recipient_id": str(uuid.uuid4()), "content": "hi"})
+        assert ws.receive_json() == {"error": "Recipient not found"}
+
+        ws.send_json({"type": "message", "recipient_id": str(BOB), "content": "  hello  "})
+        echo = ws.receive_json()
+
+    assert [msg.content for msg in written] == ["hello"]
+    assert echo["id"] == str(written[0].id)
+    assert echo["sender_username"] == "alice" and echo["recipient_id"] == str(BOB)
+
+
+def test_watch_replies_with_current_statuses(client):
+    with _chat(client) as ws:
+        ws.send_json({"type": "watch", "user_ids": [str(BOB), str(USER.id)]})
+        assert ws.receive_json() == {
+            "type": "presence",
+            "statuses": {str(BOB): "offline", str(USER.id): "online"},
+        }
+        ws.send_json({"type": "watch", "user_ids": "not a list"})
+        assert ws.receive_json() == {"error": "user_ids must be a list of ids"}
+
+
+def test_frame_rate_limit_replies_and_keeps_the_socket(client, monkeypatch):
+    monkeypatch.setattr(websocket.settings, "WS_FRAME_RATE_BURST", 3)
+    monkeypatch.setattr(websocket.settings, "WS_FRAME_RATE_PER_SECOND", 0.01)
+
+    with _chat(client) as ws:
+        for _ in range(3):
+            ws.send_json({"type": "nope"})
+            assert ws.receive_json() == {"error": "Unknown frame type"}
+        ws.send_json({"type": "nope"})
+        reply = ws.receive_json()
+
+    assert reply["error"] == "Rate limit exceeded"
+    assert 0 < reply["retry_after"] <= 100
+
+
+def test_message_rate_limit_is_per_user(client, monkeypatch):
+    monkeypatch.setattr(websocket.settings, "MESSAGE_RATE_BURST", 1)
+    monkeypatch.setattr(websocket.settings, "MESSAGE_RATE_PER_SECOND", 0.01)
+
+    async def exists(user_id, db=None):
+        return False
+
+    monkeypatch.setattr(websocket.known_users, "exists", exists)
+
+    with _chat(client) as ws:
+        ws.send_json({"recipient_id": str(BOB), "content": "one"})
+        assert ws.receive_json() == {"error": "Recipient not found"}
+    # A new socket doesn't reset the user's budget
+    with _chat(client) as ws:
+        ws.send_json({"recipient_id": str(BOB), "content": "two"})
+        assert ws.receive_json()["error"] == "Rate limit exceeded"
+
+
+def test_resume_replays_in_batches(client, monkeypatch):
+    monkeypatch.setattr(websocket.settings, "RESUME_BATCH_LIMIT", 2)
+    log = [(seq, {"type": "message", "seq": seq}) for seq in range(1, 4)]
+    asked = []
+
+    async def missed(db, user_id, after_seq, limit):
+        asked.append((user_id, after_seq, limit))
+        return [entry for entry in log if entry[0] > after_seq][:limit]
+
+    monkeypatch.setattr(websocket, "missed_messages", missed)
+
+    with _chat(client) as ws:
+        ws.send_json({"type": "resume", "last_seq": 0})
+        first = ws.receive_json()
+        ws.send_json({"type": "resume", "last_seq": first["last_seq"]})
+        second = ws.receive_json()
+        ws.send_json({"type": "resume", "last_seq": second["last_seq"]})
+        caught_up = ws.receive_json()
+
+    assert [m["seq"] for m in first["messages"]] == [1, 2] and first["more"]
+    assert [m["seq"] for m in second["messages"]] == [3] and not second["more"]
+    assert caught_up == {"type": "resume", "messages": [], "last_seq": 3, "more": False}
+    assert asked == [(USER.id, 0, 2), (USER.id, 2, 2), (USER.id, 3, 2)]
+
+
+def test_session_is_returned_before_the_receive_loop(client, monkeypatch):
+    open_sessions = []
+
+    class Session:
+        async def __aenter__(self):
+            open_sessions.append(self)
+            return self
+
+        async def __aexit__(self, *exc):
+            open_sessions.remove(self)
+
+    monkeypatch.setattr(websocket, "AsyncSessionLocal", Session)
+
+    with _chat(client) as ws:
+        ws.send_json({"type": "nope"})
+        assert ws.receive_json() == {"error": "Unknown frame type"}
+        assert open_sessions == []
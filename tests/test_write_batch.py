@@ -0,0 +1,105 @@
+import asyncio
+import uuid
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.dialects import postgresql
+
+from app.core.ids import uuid7
+from app.models.message import DirectMessage
+from app.services import message_writer as message_writer_module
+from app.services.message_writer import write_batch
+
+
+class _Result:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def scalars(self):
+        return iter(self.rows)
+
+    def tuples(self):
+        return self
+
+    def all(self):
+        return self.rows
+
+
+class FakeSession:
+    """Answers the key claim with ``claimed`` and the replay lookup with ``stored``."""
+
+    def __init__(self, claimed: list[str], stored: dict[str, DirectMessage | None]):
+        self.results = [_Result(claimed), _Result(list(stored.items()))]
+        self.statements = []
+        self.committed = False
+
+    async def execute(self, stmt):
+        self.statements.append(stmt)
+        return self.results.pop(0)
+
+    async def commit(self):
+        self.committed = True
+
+
+@pytest.fixture
+def stored_messages(monkeypatch):
+    stored = []
+
+    async def store_messages(db, messages):
+        stored.extend(messages)
+
+    monkeypatch.setattr(message_writer_module, "store_messages", store_messages)
+    return stored
+
+
+SENDER, BOB = uuid.uuid4(), uuid.uuid4()
+
+
+def _previous(content: str, recipient_id: uuid.UUID = BOB) -> DirectMessage:
+    return DirectMessage(id=uuid7(), sender_id=SENDER, recipient_id=recipient_id, content=content)
+
+
+def test_used_key_replays_the_stored_message(stored_messages):
+    previous = _previous("hello")
+    db = FakeSession(claimed=["k2"], stored={"k1": previous})
+
+    results = asyncio.run(write_batch(db, SENDER, [(BOB, "hello", "k1"), (BOB, "again", "k2"), (BOB, "x", None)]))
+
+    assert results[0] == (previous, True)
+    assert [(msg.content, replayed) for msg, replayed in results[1:]] == [("again", False), ("x", False)]
+    assert [msg.content for msg in stored_messages] == ["again", "x"]
+    assert db.committed
+
+
+def test_claim_treats_expired_keys_as_free(stored_messages):
+    db = FakeSession(claimed=["k1"], stored={})
+
+    asyncio.run(write_batch(db, SENDER, [(BOB, "hello", "k1")]))
+
+    sql = str(db.statements[0].compile(dialect=postgresql.dialect()))
+    assert "ON CONFLICT (sender_id, key) DO UPDATE" in sql
+    assert "WHERE message_idempotency_keys.created_at <= now() -" in sql
+
+
+@pytest.mark.parametrize(
+    "recipient_id, content",
+    [(BOB, "a different body"), (uuid.uuid4(), "hello")],
+)
+def test_reused_key_for_another_message_is_rejected(stored_messages, recipient_id, content):
+    db = FakeSession(claimed=[], stored={"k1": _previous("hello")})
+
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(write_batch(db, SENDER, [(recipient_id, content, "k1")]))
+
+    assert exc.value.status_code == 422
+    assert stored_messages == [] and not db.committed
+
+
+def test_key_of_an_archived_message_is_a_conflict(stored_messages):
+    db = FakeSession(claimed=[], stored={"k1": None})
+
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(write_batch(db, SENDER, [(BOB, "hello", "k1")]))
+
+    assert exc.value.status_code == 409
+    assert stored_messages == [] and not db.committed
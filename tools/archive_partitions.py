@@ -0,0 +1,119 @@
+"""
+Detach monthly direct_messages partitions older than a cutoff and export them
+to gzip-compressed CSV files.
+
+Each partition is detached first, so the app stops seeing its rows before the
+export starts, then copied out and dropped once the row count in the file
+matches the table. Pass --keep to leave the detached table in place.
+
+Usage:
+    python -m tools.archive_partitions --older-than-months 12 --out-dir /backups/messages
+    python -m tools.archive_partitions --older-than-months 12 --dry-run
+
+To restore a month, recreate its partition and load the file back:
+    SELECT direct_messages_create_partition('2025-01-01');
+    gunzip -c direct_messages_p2025_01.csv.gz | psql "$DSN" -c \\
+        "\\copy direct_messages (id, sender_id, recipient_id, content, sender_seq, recipient_seq, created_at) FROM STDIN CSV HEADER"
+"""
+import argparse
+import asyncio
+import gzip
+import os
+import re
+from datetime import date, datetime, timezone
+from pathlib import Path
+
+import asyncpg
+from sqlalchemy.engine import make_url
+
+# Generated columns are left out: they are recomputed on restore
+COLUMNS = ["id", "sender_id", "recipient_id", "content", "sender_seq", "recipient_seq", "created_at"]
+PARTITION_NAME = re.compile(r"^direct_messages_p(\d{4})_(\d{2})$")
+
+
+def cutoff_month(older_than_months: int) -> date:
+    today = datetime.now(timezone.utc).date()
+    months = today.year * 12 + today.month - 1 - older_than_months
+    return date(months // 12, months % 12 + 1, 1)
+
+
+async def list_partitions(conn: asyncpg.Connection, before: date) -> list[str]:
+    rows = await conn.fetch(
+        """
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'direct_messages'::regclass
+        ORDER BY c.relname
+        """
+    )
+    names = []
+    for row in rows:
+        match = PARTITION_NAME.match(row["relname"])
+        if match and date(int(match[1]), int(match[2]), 1) < before:
+            names.append(row["relname"])
+    return names
+
+
+async def archive(conn: asyncpg.Connection, name: str, out_dir: Path, keep: bool) -> int:
+    target = out_dir / f"{name}.csv.gz"
+    if target.exists():
+        raise RuntimeError(f"{target} already exists; move it away before archiving {name} again")
+    partial = target.with_suffix(".gz.partial")
+
+    await conn.execute(f'ALTER TABLE direct_messages DETACH PARTITION "{name}"')
+    expected = await conn.fetchval(f'SELECT count(*) FROM "{name}"')
+
+    with gzip.open(partial, "wb") as out:
+
+        async def write(chunk: bytes):
+            out.write(chunk)
+
+        status = await conn.copy_from_table(
+            name, columns=COLUMNS, output=write, format="csv", header=True
+        )
+    copied = int(status.split()[-1])
+    if copied != expected:
+        raise RuntimeError(f"{name}: exported {copied} rows but the table has {expected}; left detached")
+    partial.rename(target)
+
+    if not keep:
+        await conn.execute(f'DROP TABLE "{name}"')
+    return copied
+
+
+async def run(args):
+    dsn = make_url(args.database_url).set(drivername="postgresql").render_as_string(hide_password=False)
+    before = cutoff_month(args.older_than_months)
+    out_dir = Path(args.out_dir)
+    conn = await asyncpg.connect(dsn)
+    try:
+        names = await list_partitions(conn, before)
+        if not names:
+            print(f"no partitions before {before}")
+        for name in names:
+            if args.dry_run:
+                print(f"would archive {name}")
+                continue
+            out_dir.mkdir(parents=True, exist_ok=True)
+            rows = await archive(conn, name, out_dir, args.keep)
+            print(f"archived {name}: {rows} rows -> {out_dir / (name + '.csv.gz')}")
+    finally:
+        await conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=os.environ.get("DATABASE_URL"), required=not os.environ.get("DATABASE_URL"))
+    parser.add_argument("--older-than-months", type=int, required=True, help="Archive partitions for months before this many months ago")
+    parser.add_argument("--out-dir", default="archive")
+    parser.add_argument("--keep", action="store_true", help="Leave the detached table in place after exporting it")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+    if args.older_than_months < 1:
+        parser.error("--older-than-months must be at least 1; the current month is still being written")
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()